@@ -5,13 +5,12 @@ Shows enqueue, worker processing, retry, backoff, and DLQ
 """
 
 import os
-import time
 import json
-from queuectl.storage import Storage
+from contextlib import suppress
+from queuectl.storage import Storage, doorbell_path
 from queuectl.queue import Queue
 from queuectl.worker import Worker
 from queuectl.config import Config
-import threading
 
 def print_section(title):
     print("\n" + "=" * 60)
@@ -25,18 +24,21 @@ def show_jobs(storage):
     for j in jobs:
         print(f"  • {j['id']}: {j['state']} (attempts: {j['attempts']}/{j['max_retries']})")
 
+def remove_files(paths):
+    for path in paths:
+        with suppress(FileNotFoundError):
+            os.remove(path)
+
 def main():
     print_section("QueueCTL Complete Demo")
     
-    # Clean up
-    for f in ["queuectl.db", "workers.pid", "queuectl.config.json"]:
-        if os.path.exists(f):
-            os.remove(f)
+    # Clean up, including the database's WAL, shared-memory and doorbell files
+    remove_files(["queuectl.db", "queuectl.db-wal", "queuectl.db-shm",
+                  doorbell_path("queuectl.db"), "workers.pid", "queuectl.config.json"])
     
     print_section("1. Configuration Setup")
     config = Config()
-    config.set("max_retries", 2)
-    config.set("backoff_base", 2)
+    config.update({"max_retries": 2, "backoff_base": 2, "backoff_jitter": "none"})
     print(f"✓ max_retries: {config.get('max_retries')}")
     print(f"✓ backoff_base: {config.get('backoff_base')}")
     
@@ -54,9 +56,8 @@ def main():
         {"id": "success-3", "command": "python -c \"print('Success 3')\""},
     ]
     
-    for job_data in jobs_to_enqueue:
-        result = queue.enqueue(job_data)
-        print(f"  {result['message']}")
+    result = queue.enqueue_many(jobs_to_enqueue)
+    print(f"  {result['message']}")
     
     show_jobs(storage)
     
@@ -65,13 +66,7 @@ def main():
     worker = Worker("demo-worker", queue=queue)
     
     # Auto-stop worker after 12 seconds
-    def stop_worker_after_delay():
-        time.sleep(12)
-        worker.running = False
-        print("\n⏰ [Auto-stop] Stopping worker after 12 seconds")
-    
-    stop_thread = threading.Thread(target=stop_worker_after_delay, daemon=True)
-    stop_thread.start()
+    worker.stop_after(12)
     
     print("🚀 Worker started (will process jobs and handle retries)")
     print("   Watch for:")
@@ -82,6 +77,7 @@ def main():
     print()
     
     worker.start()
+    print("\n⏰ [Auto-stop] Worker stopped after 12 seconds")
     
     print_section("5. Final Results")
     show_jobs(storage)
@@ -117,6 +113,8 @@ def main():
     print("\n🎉 QueueCTL is fully functional!")
     
     storage.close()
+    # The database is kept for inspection with the CLI
+    remove_files([doorbell_path(storage.db_path), config.config_file])
 
 if __name__ == "__main__":
     main()
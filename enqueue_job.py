@@ -4,11 +4,14 @@
 Usage:
   python enqueue_job.py [path-to-json]
 
-If no path is provided, it defaults to ./job.json
+If no path is provided, it defaults to ./job.json. The file may contain a
+single job object or a JSON array of jobs, which are enqueued together in
+one transaction. Jobs in an array whose ID already exists, or repeats
+earlier in the array, are skipped.
 """
 import sys
-import json
 from queuectl.queue import Queue
+from queuectl._json import loads, JSONDecodeError
 
 
 def main():
@@ -16,13 +19,16 @@ def main():
     with open(path, "r", encoding="utf-8") as fh:
         job_json = fh.read()
     try:
-        job_data = json.loads(job_json)
-    except json.JSONDecodeError as exc:
+        job_data = loads(job_json)
+    except JSONDecodeError as exc:
         print(f"invalid JSON in {path}: {exc}")
         return
 
     q = Queue()
-    res = q.enqueue(job_data)
+    if isinstance(job_data, list):
+        res = q.enqueue_many(job_data, skip_existing=True)
+    else:
+        res = q.enqueue(job_data)
     print(res.get('message', res))
 
 
@@ -0,0 +1,29 @@
+"""
+JSON helpers for QueueCTL
+Uses orjson when it is installed and falls back to the standard library
+"""
+
+import json
+from json import JSONDecodeError  # orjson.JSONDecodeError subclasses this
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on environment
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(obj) -> str:
+        """Serialize obj to a compact JSON string"""
+        return orjson.dumps(obj).decode()
+    
+    loads = orjson.loads
+else:
+    def dumps(obj) -> str:
+        """Serialize obj to a compact JSON string"""
+        return json.dumps(obj, separators=(',', ':'))
+    
+    loads = json.loads
+
+
+__all__ = ["dumps", "loads", "JSONDecodeError"]
@@ -4,22 +4,88 @@ Handles all command-line commands using argparse
 """
 
 import argparse
-import json
 import sys
-from tabulate import tabulate
+import time
 
 from .queue import Queue
 from .worker import WorkerManager
 from .config import get_config
 from .storage import JobState
-from .utils import format_datetime, truncate_string, validate_job_data
+from ._json import loads, JSONDecodeError
+from .utils import format_columns, format_datetime, truncate_string, validate_job_data
+
+
+# Jobs per transaction when enqueueing from stdin
+STDIN_BATCH_SIZE = 10000
+
+
+def _enqueue_stdin(stream) -> int:
+    """Enqueue newline-delimited JSON jobs from `stream` in batches"""
+    queue = Queue()
+    batch = []
+    enqueued = 0
+    failed = 0
+    
+    def flush():
+        nonlocal enqueued, failed
+        if not batch:
+            return
+        # Jobs whose ID already exists, or repeats within the batch, are
+        # skipped without failing the batch
+        result = queue.enqueue_many(batch, skip_existing=True)
+        if result['success']:
+            enqueued += result['enqueued']
+            if result.get('skipped'):
+                print(f"✗ {result['skipped']} job(s) skipped: ID already exists or is repeated")
+                failed += result['skipped']
+        else:
+            print(f"✗ {result['message']}")
+            failed += len(batch)
+        batch.clear()
+    
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        
+        try:
+            job_data = loads(line)
+        except JSONDecodeError as e:
+            print(f"Error: line {line_no}: Invalid JSON - {str(e)}")
+            failed += 1
+            continue
+        
+        is_valid, error = validate_job_data(job_data)
+        if not is_valid:
+            print(f"Error: line {line_no}: {error}")
+            failed += 1
+            continue
+        
+        batch.append(job_data)
+        if len(batch) >= STDIN_BATCH_SIZE:
+            flush()
+    
+    flush()
+    
+    if failed:
+        print(f"✗ Enqueued {enqueued} job(s), {failed} failed")
+        return 1
+    print(f"✓ Enqueued {enqueued} job(s)")
+    return 0
 
 
 def cmd_enqueue(args):
     """Handle enqueue command"""
     try:
+        if args.stdin:
+            return _enqueue_stdin(sys.stdin)
+        
+        if not args.job_json:
+            print("Error: Provide job data as JSON or use --stdin")
+            return 1
+        
         # Parse job data from JSON string
-        job_data = json.loads(args.job_json)
+        job_data = loads(args.job_json)
         
         # Validate job data
         is_valid, error = validate_job_data(job_data)
@@ -38,7 +104,7 @@ def cmd_enqueue(args):
             print(f"✗ {result['message']}")
             return 1
     
-    except json.JSONDecodeError as e:
+    except JSONDecodeError as e:
         print(f"Error: Invalid JSON - {str(e)}")
         return 1
     except Exception as e:
@@ -87,6 +153,8 @@ def cmd_worker_stop(args):
 
 def cmd_status(args):
     """Handle status command"""
+    from tabulate import tabulate
+    
     try:
         queue = Queue()
         stats = queue.get_stats()
@@ -137,28 +205,30 @@ def cmd_list(args):
             return 1
         
         queue = Queue()
-        jobs = queue.list_jobs(state=state, limit=limit)
+        jobs = queue.list_jobs_columnar(
+            ('id', 'command', 'state', 'attempts', 'max_retries', 'created_at', 'error_message'),
+            state=state, limit=limit
+        )
+        count = len(jobs['id'])
         
-        if not jobs:
+        if not count:
             print(f"No jobs found{' in state: ' + state if state else ''}")
             return 0
         
-        # Format job list
-        table_data = []
-        for job in jobs:
-            table_data.append([
-                truncate_string(job['id'], 20),
-                truncate_string(job['command'], 40),
-                job['state'],
-                job['attempts'],
-                job['max_retries'],
-                format_datetime(job['created_at']),
-                truncate_string(job.get('error_message', '') or '', 30)
-            ])
+        # Format job list column by column
+        columns = [
+            [truncate_string(v, 20) for v in jobs['id']],
+            [truncate_string(v, 40) for v in jobs['command']],
+            jobs['state'],
+            jobs['attempts'],
+            jobs['max_retries'],
+            [format_datetime(v) for v in jobs['created_at']],
+            [truncate_string(v or '', 30) for v in jobs['error_message']]
+        ]
         
         headers = ["Job ID", "Command", "State", "Attempts", "Max Retries", "Created", "Error"]
-        print(tabulate(table_data, headers=headers, tablefmt="grid"))
-        print(f"\nTotal: {len(jobs)} job(s)")
+        print(format_columns(columns, headers))
+        print(f"\nTotal: {count} job(s)")
         
         return 0
     
@@ -173,26 +243,28 @@ def cmd_dlq_list(args):
         limit = args.limit or 100
         
         queue = Queue()
-        jobs = queue.get_dlq_jobs(limit=limit)
+        jobs = queue.list_jobs_columnar(
+            ('id', 'command', 'attempts', 'updated_at', 'error_message'),
+            state=JobState.DLQ, limit=limit
+        )
+        count = len(jobs['id'])
         
-        if not jobs:
+        if not count:
             print("No jobs in Dead Letter Queue")
             return 0
         
-        # Format job list
-        table_data = []
-        for job in jobs:
-            table_data.append([
-                truncate_string(job['id'], 20),
-                truncate_string(job['command'], 40),
-                job['attempts'],
-                format_datetime(job['updated_at']),
-                truncate_string(job.get('error_message', '') or '', 40)
-            ])
+        # Format job list column by column
+        columns = [
+            [truncate_string(v, 20) for v in jobs['id']],
+            [truncate_string(v, 40) for v in jobs['command']],
+            jobs['attempts'],
+            [format_datetime(v) for v in jobs['updated_at']],
+            [truncate_string(v or '', 40) for v in jobs['error_message']]
+        ]
         
         headers = ["Job ID", "Command", "Attempts", "Last Updated", "Error"]
-        print(tabulate(table_data, headers=headers, tablefmt="grid"))
-        print(f"\nTotal: {len(jobs)} job(s) in DLQ")
+        print(format_columns(columns, headers))
+        print(f"\nTotal: {count} job(s) in DLQ")
         
         return 0
     
@@ -223,6 +295,8 @@ def cmd_dlq_retry(args):
 
 def cmd_config_get(args):
     """Handle config get command"""
+    from tabulate import tabulate
+    
     try:
         config = get_config()
         
@@ -299,21 +373,18 @@ def cmd_config_reset(args):
         return 1
 
 
-def main():
-    """Main CLI entry point"""
-    parser = argparse.ArgumentParser(
-        prog='queuectl',
-        description='QueueCTL - A CLI-based background job queue system'
-    )
-    
-    subparsers = parser.add_subparsers(dest='command', help='Available commands')
-    
-    # Enqueue command
+def _add_enqueue_parser(subparsers):
+    """Add the enqueue command"""
     parser_enqueue = subparsers.add_parser('enqueue', help='Add a new job to the queue')
-    parser_enqueue.add_argument('job_json', help='Job data as JSON string')
+    parser_enqueue.add_argument('job_json', nargs='?', help='Job data as JSON string')
+    parser_enqueue.add_argument('--stdin', action='store_true',
+                                help='Read newline-delimited JSON jobs from stdin and '
+                                     f'enqueue them in batches of {STDIN_BATCH_SIZE}')
     parser_enqueue.set_defaults(func=cmd_enqueue)
-    
-    # Worker commands
+
+
+def _add_worker_parser(subparsers):
+    """Add the worker commands"""
     parser_worker = subparsers.add_parser('worker', help='Manage workers')
     worker_subparsers = parser_worker.add_subparsers(dest='worker_command')
     
@@ -331,12 +402,16 @@ def main():
     parser_worker_run.set_defaults(func=cmd_worker_run)
     parser_worker_stop = worker_subparsers.add_parser('stop', help='Stop all workers')
     parser_worker_stop.set_defaults(func=cmd_worker_stop)
-    
-    # Status command
+
+
+def _add_status_parser(subparsers):
+    """Add the status command"""
     parser_status = subparsers.add_parser('status', help='Show queue and worker status')
     parser_status.set_defaults(func=cmd_status)
-    
-    # List command
+
+
+def _add_list_parser(subparsers):
+    """Add the list command"""
     parser_list = subparsers.add_parser('list', help='List jobs')
     parser_list.add_argument('--state', choices=[JobState.PENDING, JobState.PROCESSING, 
                             JobState.COMPLETED, JobState.FAILED, JobState.DLQ],
@@ -344,8 +419,10 @@ def main():
     parser_list.add_argument('--limit', type=int, default=100, 
                             help='Maximum number of jobs to show (default: 100)')
     parser_list.set_defaults(func=cmd_list)
-    
-    # DLQ commands
+
+
+def _add_dlq_parser(subparsers):
+    """Add the DLQ commands"""
     parser_dlq = subparsers.add_parser('dlq', help='Manage Dead Letter Queue')
     dlq_subparsers = parser_dlq.add_subparsers(dest='dlq_command')
     
@@ -357,8 +434,10 @@ def main():
     parser_dlq_retry = dlq_subparsers.add_parser('retry', help='Retry a job from DLQ')
     parser_dlq_retry.add_argument('job_id', help='Job ID to retry')
     parser_dlq_retry.set_defaults(func=cmd_dlq_retry)
-    
-    # Config commands
+
+
+def _add_config_parser(subparsers):
+    """Add the config commands"""
     parser_config = subparsers.add_parser('config', help='Manage configuration')
     config_subparsers = parser_config.add_subparsers(dest='config_command')
     
@@ -374,9 +453,53 @@ def main():
     parser_config_reset = config_subparsers.add_parser('reset', help='Reset configuration')
     parser_config_reset.add_argument('key', nargs='?', help='Configuration key to reset (optional)')
     parser_config_reset.set_defaults(func=cmd_config_reset)
+
+
+# Subparser builders keyed by top-level command name
+_PARSER_BUILDERS = {
+    'enqueue': _add_enqueue_parser,
+    'worker': _add_worker_parser,
+    'status': _add_status_parser,
+    'list': _add_list_parser,
+    'dlq': _add_dlq_parser,
+    'config': _add_config_parser,
+}
+
+
+def build_parser(command=None):
+    """
+    Build the argument parser
+    
+    Args:
+        command: If a known command name, only that command's subparser is
+            built. Otherwise all commands are added (for help and errors).
+    """
+    parser = argparse.ArgumentParser(
+        prog='queuectl',
+        description='QueueCTL - A CLI-based background job queue system'
+    )
+    
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+    
+    if command in _PARSER_BUILDERS:
+        _PARSER_BUILDERS[command](subparsers)
+    else:
+        for add_parser in _PARSER_BUILDERS.values():
+            add_parser(subparsers)
+    
+    return parser
+
+
+def main(argv=None):
+    """Main CLI entry point"""
+    if argv is None:
+        argv = sys.argv[1:]
+    
+    # Only build the subparser for the command being run
+    parser = build_parser(argv[0] if argv else None)
     
     # Parse arguments
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     if not args.command:
         parser.print_help()
@@ -386,14 +509,14 @@ def main():
     if hasattr(args, 'func'):
         return args.func(args)
     else:
-        parser.print_help()
+        build_parser().print_help()
         return 1
 
 
 def cmd_worker_run(args):
     """Run a single worker in the foreground (blocking)"""
     try:
-        worker_id = args.worker_id if hasattr(args, 'worker_id') and args.worker_id else f"worker-foreground-{int(__import__('time').time())}"
+        worker_id = args.worker_id if hasattr(args, 'worker_id') and args.worker_id else f"worker-fg-{time.time_ns()}"
         manager = WorkerManager()
         # Run worker in current process; allow exiting when idle if requested
         exit_on_idle = getattr(args, 'exit_when_idle', False)
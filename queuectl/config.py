@@ -3,9 +3,53 @@ Configuration management for QueueCTL
 Handles retry policies, backoff settings, and system configuration
 """
 
-import json
+import copy
+import math
 import os
-from typing import Dict, Any, Optional
+import random
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+from ._json import dumps, loads, JSONDecodeError
+
+
+# Parsed config files keyed by absolute path, validated against (mtime_ns, size)
+_FILE_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+
+
+JITTER_MODES = ("none", "full", "equal")
+
+
+def calculate_backoff_delay(attempts: int, base: float = 2, max_delay: int = 3600,
+                            jitter: str = "full", initial: float = 1) -> float:
+    """
+    Calculate exponential backoff delay in seconds, with optional jitter
+    
+    Jitter spreads out retries of jobs that failed together so they don't
+    all wake up at the same moment:
+        none:  min(initial * base ** attempts, max_delay)
+        full:  random value between 0 and the capped delay
+        equal: half the capped delay plus a random value up to the other half
+    
+    Whole-number base and initial give whole seconds; fractional ones give
+    fractional delays.
+    """
+    # Cap before exponentiating: with fractional settings a high attempt
+    # count would overflow a float long before the min() could apply
+    if max_delay <= 0 or (base > 1 and initial > 0 and
+                          attempts >= (math.log(max_delay) - math.log(initial)) / math.log(base)):
+        delay = max_delay
+    else:
+        delay = min(initial * base ** attempts, max_delay)
+    
+    if jitter == "full":
+        delay = random.uniform(0, delay)
+    elif jitter == "equal":
+        delay = delay / 2 + random.uniform(0, delay / 2)
+    
+    if isinstance(base, int) and isinstance(initial, int):
+        return int(delay)
+    return delay
 
 
 class Config:
@@ -15,7 +59,9 @@ class Config:
     DEFAULTS = {
         "max_retries": 3,
         "backoff_base": 2,
+        "backoff_initial": 1,  # seconds, multiplied by base ** attempts
         "backoff_max_delay": 3600,  # 1 hour max
+        "backoff_jitter": "full",  # none, full or equal
         "worker_poll_interval": 1,  # seconds
         "worker_heartbeat_interval": 5,  # seconds
         "job_timeout": 300,  # 5 minutes default timeout
@@ -23,6 +69,13 @@ class Config:
         "log_level": "INFO"
     }
     
+    # Keys that must hold non-negative integers
+    INT_KEYS = ("max_retries", "worker_heartbeat_interval", "job_timeout",
+                "backoff_max_delay")
+    
+    # Keys that must hold non-negative numbers (fractions allowed)
+    NUMBER_KEYS = ("backoff_base", "backoff_initial", "worker_poll_interval")
+    
     def __init__(self, config_file: str = "queuectl.config.json"):
         """Initialize configuration"""
         self.config_file = config_file
@@ -30,45 +83,93 @@ class Config:
     
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from file or use defaults"""
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    user_config = json.load(f)
-                    # Merge with defaults
-                    config = self.DEFAULTS.copy()
-                    config.update(user_config)
-                    return config
-            except (json.JSONDecodeError, IOError):
-                # If config file is corrupted, use defaults
-                return self.DEFAULTS.copy()
-        return self.DEFAULTS.copy()
+        try:
+            st = os.stat(self.config_file)
+        except OSError:
+            return self.DEFAULTS.copy()
+        
+        # Reuse the parsed file while it is unchanged on disk
+        path = os.path.abspath(self.config_file)
+        key = (st.st_mtime_ns, st.st_size)
+        cached = _FILE_CACHE.get(path)
+        if cached is not None and cached[0] == key:
+            return copy.deepcopy(cached[1])
+        
+        try:
+            with open(self.config_file, 'r') as f:
+                user_config = loads(f.read())
+                # Merge with defaults
+                config = self.DEFAULTS.copy()
+                config.update(user_config)
+        except (JSONDecodeError, IOError):
+            # If config file is corrupted, use defaults
+            return self.DEFAULTS.copy()
+        
+        _FILE_CACHE[path] = (key, config)
+        return copy.deepcopy(config)
     
     def _save_config(self) -> bool:
-        """Save configuration to file"""
+        """Save configuration to file atomically"""
+        tmp_file = self.config_file + ".tmp"
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.config, f, indent=2)
+            with open(tmp_file, 'w') as f:
+                f.write(dumps(self.config))
+            # Readers see either the old or the new file, never a partial one
+            os.replace(tmp_file, self.config_file)
             return True
-        except IOError:
+        except (IOError, OSError):
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
             return False
     
+    def _validate(self, key: str, value: Any) -> Tuple[bool, Any]:
+        """Validate a configuration value, returning (is_valid, normalized_value)"""
+        if key in self.INT_KEYS:
+            try:
+                value = int(value) if not isinstance(value, int) else value
+                if value < 0:
+                    raise ValueError("Value must be non-negative")
+            except (ValueError, TypeError):
+                return False, value
+        
+        if key in self.NUMBER_KEYS:
+            try:
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    value = float(value)
+                if not value >= 0:
+                    raise ValueError("Value must be non-negative")
+            except (ValueError, TypeError):
+                return False, value
+        
+        if key == "backoff_jitter" and value not in JITTER_MODES:
+            return False, value
+        
+        return True, value
+    
     def get(self, key: str, default: Any = None) -> Any:
         """Get configuration value"""
         return self.config.get(key, default)
     
     def set(self, key: str, value: Any) -> bool:
         """Set configuration value and persist"""
-        # Validate certain keys
-        if key in ["max_retries", "backoff_base", "worker_poll_interval", 
-                   "worker_heartbeat_interval", "job_timeout", "backoff_max_delay"]:
-            try:
-                value = int(value) if not isinstance(value, int) else value
-                if value < 0:
-                    raise ValueError("Value must be non-negative")
-            except (ValueError, TypeError):
+        return self.update({key: value})
+    
+    def update(self, items: Dict[str, Any]) -> bool:
+        """
+        Set several configuration values and persist them with a single write
+        
+        Nothing is changed if any value fails validation.
+        """
+        validated = {}
+        for key, value in items.items():
+            is_valid, value = self._validate(key, value)
+            if not is_valid:
                 return False
+            validated[key] = value
         
-        self.config[key] = value
+        self.config.update(validated)
         return self._save_config()
     
     def get_all(self) -> Dict[str, Any]:
@@ -86,13 +187,15 @@ class Config:
             self.config = self.DEFAULTS.copy()
             return self._save_config()
     
-    def calculate_backoff_delay(self, attempts: int) -> int:
+    def calculate_backoff_delay(self, attempts: int) -> float:
         """Calculate exponential backoff delay in seconds"""
-        base = self.get("backoff_base", 2)
-        max_delay = self.get("backoff_max_delay", 3600)
-        
-        delay = base ** attempts
-        return min(delay, max_delay)
+        return calculate_backoff_delay(
+            attempts,
+            base=self.get("backoff_base", 2),
+            max_delay=self.get("backoff_max_delay", 3600),
+            jitter=self.get("backoff_jitter", "full"),
+            initial=self.get("backoff_initial", 1)
+        )
     
     @property
     def max_retries(self) -> int:
@@ -105,7 +208,7 @@ class Config:
         return self.get("db_path", "queuectl.db")
     
     @property
-    def worker_poll_interval(self) -> int:
+    def worker_poll_interval(self) -> float:
         """Get worker poll interval"""
         return self.get("worker_poll_interval", 1)
     
@@ -120,13 +223,24 @@ class Config:
         return self.get("job_timeout", 300)
 
 
-# Global config instance
+# Global config instance, created on first use
 _config_instance = None
+_config_lock = threading.Lock()
 
 
 def get_config() -> Config:
     """Get global config instance"""
     global _config_instance
     if _config_instance is None:
-        _config_instance = Config()
+        # Double-checked so concurrent first callers share one instance
+        with _config_lock:
+            if _config_instance is None:
+                _config_instance = Config()
     return _config_instance
+
+
+def reset_config():
+    """Drop the global config instance so the next get_config() reloads it"""
+    global _config_instance
+    with _config_lock:
+        _config_instance = None
@@ -3,21 +3,45 @@ Core queue logic for QueueCTL
 Handles job enqueueing, state transitions, and DLQ management
 """
 
-import json
-from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
+import threading
+import time
+from typing import Dict, Any, Optional, List, Sequence
 
-from .storage import Storage, JobState
-from .config import get_config
+from .storage import Storage, JobState, now_us
+from .config import Config, get_config, calculate_backoff_delay
+
+
+# Job fields stored in their own columns; everything else becomes metadata
+_RESERVED_FIELDS = frozenset(('id', 'command', 'max_retries'))
+
+# How often wait_for_jobs checks the doorbell file for work queued by other
+# processes (seconds)
+_DOORBELL_CHECK_INTERVAL = 0.05
 
 
 class Queue:
     """Job queue manager"""
     
-    def __init__(self, storage: Optional[Storage] = None):
-        """Initialize queue with storage backend"""
-        self.config = get_config()
+    def __init__(self, storage: Optional[Storage] = None,
+                 config: Optional[Config] = None):
+        """Initialize queue with storage backend and config (the global one by default)"""
+        self.config = config or get_config()
         self.storage = storage or Storage(self.config.db_path)
+        # Set whenever new work is queued so idle workers in this process
+        # wake up immediately instead of waiting out their poll interval
+        self._notify_event = threading.Event()
+        # Doorbell mtime last seen by wait_for_jobs; see Storage.doorbell_mtime
+        self._doorbell_seen = self.storage.doorbell_mtime()
+        self.reload_config()
+    
+    def reload_config(self):
+        """Snapshot the config values used on the job hot paths"""
+        cfg = self.config.get_all()
+        self._max_retries = cfg.get("max_retries", 3)
+        self._backoff_base = cfg.get("backoff_base", 2)
+        self._backoff_initial = cfg.get("backoff_initial", 1)
+        self._backoff_max = cfg.get("backoff_max_delay", 3600)
+        self._backoff_jitter = cfg.get("backoff_jitter", "full")
     
     def enqueue(self, job_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -39,11 +63,11 @@ class Queue:
             }
         
         # Get max_retries from job data or use config default
-        max_retries = job_data.get('max_retries', self.config.max_retries)
+        max_retries = job_data.get('max_retries', self._max_retries)
         
         # Extract metadata (any additional fields)
         metadata = {k: v for k, v in job_data.items() 
-                   if k not in ['id', 'command', 'max_retries']}
+                   if k not in _RESERVED_FIELDS}
         
         success = self.storage.enqueue_job(
             job_id=job_id,
@@ -53,6 +77,7 @@ class Queue:
         )
         
         if success:
+            self._notify_event.set()
             return {
                 'success': True,
                 'message': f'Job {job_id} enqueued successfully',
@@ -64,6 +89,131 @@ class Queue:
                 'message': f'Job {job_id} already exists'
             }
     
+    def enqueue_many(self, jobs: List[Dict[str, Any]],
+                     skip_existing: bool = False) -> Dict[str, Any]:
+        """
+        Enqueue several jobs in a single transaction
+        
+        Args:
+            jobs: List of dictionaries with 'id' and 'command' keys
+            skip_existing: Enqueue the rest of the batch when some job IDs
+                already exist or repeat within the batch, instead of
+                enqueueing nothing. Skipped jobs are counted in 'skipped'.
+        
+        Returns:
+            Dictionary with success status, message and enqueued count
+        """
+        rows = []
+        seen = set()
+        repeated = 0
+        
+        for index, job_data in enumerate(jobs):
+            job_id = job_data.get('id')
+            command = job_data.get('command')
+            
+            if not job_id or not command:
+                return {
+                    'success': False,
+                    'message': f'Job at index {index} must have "id" and "command" fields'
+                }
+            
+            if job_id in seen:
+                if skip_existing:
+                    # Keep the first occurrence, like an ID already stored
+                    repeated += 1
+                    continue
+                return {
+                    'success': False,
+                    'message': f'Job {job_id} appears more than once in batch'
+                }
+            seen.add(job_id)
+            
+            max_retries = job_data.get('max_retries', self._max_retries)
+            metadata = {k: v for k, v in job_data.items()
+                       if k not in _RESERVED_FIELDS}
+            rows.append((job_id, command, max_retries, metadata or None))
+        
+        if not rows:
+            return {
+                'success': True,
+                'message': 'No jobs to enqueue',
+                'enqueued': 0
+            }
+        
+        if skip_existing:
+            enqueued = self.storage.enqueue_jobs(rows)
+            if enqueued:
+                self._notify_event.set()
+            existing = len(rows) - enqueued
+            skipped = existing + repeated
+            message = f'{enqueued} job(s) enqueued successfully'
+            if existing:
+                message += f', {existing} already existed'
+            if repeated:
+                message += f', {repeated} repeated in batch'
+            return {
+                'success': True,
+                'message': message,
+                'enqueued': enqueued,
+                'skipped': skipped
+            }
+        
+        if self.storage.enqueue_jobs_bulk(rows):
+            self._notify_event.set()
+            return {
+                'success': True,
+                'message': f'{len(rows)} job(s) enqueued successfully',
+                'enqueued': len(rows)
+            }
+        else:
+            return {
+                'success': False,
+                'message': 'One or more jobs already exist; no jobs were enqueued',
+                'enqueued': 0
+            }
+    
+    def wait_for_jobs(self, timeout: float,
+                      stop: Optional[threading.Event] = None) -> bool:
+        """
+        Block until a job is queued, or `timeout` seconds pass
+        
+        Jobs queued through this Queue wake the caller immediately; jobs
+        queued by other processes are noticed through the storage doorbell
+        file within _DOORBELL_CHECK_INTERVAL. Wakeups are hints, so callers
+        still poll storage after each wait.
+        
+        Args:
+            stop: Return early once this event is set, also checked every
+                _DOORBELL_CHECK_INTERVAL
+        
+        Returns:
+            True if woken by new work, False on timeout or stop
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            if stop is not None and stop.is_set():
+                return False
+            
+            doorbell = self.storage.doorbell_mtime()
+            if doorbell != self._doorbell_seen:
+                self._doorbell_seen = doorbell
+                self._notify_event.clear()
+                return True
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            
+            if self._notify_event.wait(min(remaining, _DOORBELL_CHECK_INTERVAL)):
+                self._notify_event.clear()
+                # The same enqueue rang the doorbell; don't wake for it twice
+                self._doorbell_seen = self.storage.doorbell_mtime()
+                return True
+    
+    def wake_waiters(self):
+        """Wake callers blocked in wait_for_jobs without queuing any work"""
+        self._notify_event.set()
+    
     def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
         """Get job details by ID"""
         return self.storage.get_job(job_id)
@@ -81,6 +231,15 @@ class Queue:
         """
         return self.storage.list_jobs(state=state, limit=limit)
     
+    def list_jobs_columnar(self, columns: Sequence[str], state: Optional[str] = None,
+                           limit: int = 100) -> Dict[str, list]:
+        """
+        List jobs as a dictionary of column name -> list of values
+        
+        Cheaper than list_jobs for display, which formats column by column.
+        """
+        return self.storage.list_jobs_columnar(columns, state=state, limit=limit)
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get queue statistics"""
         job_stats = self.storage.get_job_stats()
@@ -105,6 +264,15 @@ class Queue:
         Returns:
             Dictionary with success status and message
         """
+        # Reset job to pending state, guarded on its current state
+        if self.storage.requeue_job(job_id, [JobState.FAILED, JobState.DLQ]):
+            self._notify_event.set()
+            return {
+                'success': True,
+                'message': f'Job {job_id} moved back to pending queue'
+            }
+        
+        # Nothing was updated; look the job up only to explain why
         job = self.storage.get_job(job_id)
         
         if not job:
@@ -113,30 +281,10 @@ class Queue:
                 'message': f'Job {job_id} not found'
             }
         
-        if job['state'] not in [JobState.FAILED, JobState.DLQ]:
-            return {
-                'success': False,
-                'message': f'Job {job_id} is in state "{job["state"]}" and cannot be retried'
-            }
-        
-        # Reset job to pending state
-        success = self.storage.update_job_state(
-            job_id=job_id,
-            state=JobState.PENDING,
-            error_message=None,
-            worker_id=None
-        )
-        
-        if success:
-            return {
-                'success': True,
-                'message': f'Job {job_id} moved back to pending queue'
-            }
-        else:
-            return {
-                'success': False,
-                'message': f'Failed to retry job {job_id}'
-            }
+        return {
+            'success': False,
+            'message': f'Job {job_id} is in state "{job["state"]}" and cannot be retried'
+        }
     
     def handle_job_success(self, job_id: str, worker_id: str) -> bool:
         """Mark job as completed"""
@@ -148,48 +296,51 @@ class Queue:
         )
     
     def handle_job_failure(self, job_id: str, error_message: str, 
-                          worker_id: str) -> Dict[str, Any]:
+                          worker_id: str, attempts: Optional[int] = None) -> Dict[str, Any]:
         """
         Handle job failure with retry logic
         
+        Args:
+            attempts: The job's attempt count after it was claimed. Workers pass
+                the value from the claimed job; when omitted it is read from storage.
+        
         Returns:
             Dictionary with action taken (retry or dlq)
         """
-        job = self.storage.get_job(job_id)
+        if attempts is None:
+            job = self.storage.get_job(job_id)
+            if not job:
+                return {'action': 'error', 'message': 'Job not found'}
+            attempts = job['attempts']
         
-        if not job:
-            return {'action': 'error', 'message': 'Job not found'}
+        # Backoff for the retry, used only if the job is not moved to the DLQ
+        backoff_delay = calculate_backoff_delay(
+            attempts,
+            base=self._backoff_base,
+            max_delay=self._backoff_max,
+            jitter=self._backoff_jitter,
+            initial=self._backoff_initial
+        )
+        next_retry_at = now_us() + int(backoff_delay * 1_000_000)
         
-        # Attempts already incremented when job was claimed
-        attempts = job['attempts']
-        max_retries = job['max_retries']
+        result = self.storage.atomic_fail_or_dlq(job_id, error_message, next_retry_at)
         
-        if attempts >= max_retries:
-            # Move to DLQ
-            self.storage.move_to_dlq(job_id, error_message)
+        if not result:
+            return {'action': 'error', 'message': 'Job not found'}
+        
+        if result['state'] == JobState.DLQ:
             return {
                 'action': 'dlq',
-                'message': f'Job {job_id} moved to DLQ after {attempts} attempts'
-            }
-        else:
-            # Schedule retry with exponential backoff
-            backoff_delay = self.config.calculate_backoff_delay(attempts)
-            next_retry_at = (datetime.utcnow() + timedelta(seconds=backoff_delay)).isoformat()
-            
-            # Schedule retry without incrementing attempts (already done on claim)
-            self.storage.schedule_retry(
-                job_id=job_id,
-                next_retry_at=next_retry_at,
-                error_message=error_message
-            )
-            
-            return {
-                'action': 'retry',
-                'message': f'Job {job_id} will retry in {backoff_delay} seconds',
-                'attempts': attempts,
-                'max_retries': max_retries,
-                'next_retry_at': next_retry_at
+                'message': f'Job {job_id} moved to DLQ after {result["attempts"]} attempts'
             }
+        
+        return {
+            'action': 'retry',
+            'message': f'Job {job_id} will retry in {backoff_delay:g} seconds',
+            'attempts': result['attempts'],
+            'max_retries': result['max_retries'],
+            'next_retry_at': next_retry_at
+        }
     
     def get_dlq_jobs(self, limit: int = 100) -> List[Dict[str, Any]]:
         """Get all jobs in Dead Letter Queue"""
@@ -3,14 +3,381 @@ Storage layer for QueueCTL using SQLite
 Handles job persistence, state management, and database operations
 """
 
+import queue
 import sqlite3
-import json
 import threading
-from datetime import datetime
-from typing import List, Dict, Optional, Any
+import time
+from typing import Callable, List, Dict, Optional, Any, Sequence, Tuple
 from contextlib import contextmanager
 import os
 
+from ._json import dumps, loads, JSONDecodeError
+
+
+# Maintain job_state_counts inside the same transaction as every change to
+# the jobs table, whichever statement makes it
+_STATE_COUNT_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_count_insert
+    AFTER INSERT ON jobs
+    BEGIN
+        INSERT OR IGNORE INTO job_state_counts (state, n) VALUES (NEW.state, 0);
+        UPDATE job_state_counts SET n = n + 1 WHERE state = NEW.state;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_count_update
+    AFTER UPDATE OF state ON jobs
+    WHEN OLD.state <> NEW.state
+    BEGIN
+        UPDATE job_state_counts SET n = n - 1 WHERE state = OLD.state;
+        INSERT OR IGNORE INTO job_state_counts (state, n) VALUES (NEW.state, 0);
+        UPDATE job_state_counts SET n = n + 1 WHERE state = NEW.state;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_jobs_count_delete
+    AFTER DELETE ON jobs
+    BEGIN
+        UPDATE job_state_counts SET n = n - 1 WHERE state = OLD.state;
+    END
+    """,
+)
+
+# Prepared statements kept per connection (sqlite3 default is 128)
+_STATEMENT_CACHE_SIZE = 256
+
+# Applied to every new connection. WAL (switched on once in Storage._init_db,
+# since it persists in the database file) lets readers run concurrently with
+# the writer, and synchronous=NORMAL only fsyncs at checkpoints in WAL mode.
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",  # 64 MiB
+    "PRAGMA mmap_size=268435456",  # 256 MiB
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA wal_autocheckpoint=1000",  # pages
+)
+
+# Used instead by Storage(fast=True): no fsyncs and an in-memory rollback
+# journal, so a crash can lose or corrupt the database. Meant for throwaway
+# databases such as the test suite's.
+_FAST_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=MEMORY",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",  # 8 MiB
+    "PRAGMA busy_timeout=5000",
+)
+
+
+# Bumped whenever the on-disk schema changes; see Storage._migrate
+SCHEMA_VERSION = 3
+
+_JOBS_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id TEXT PRIMARY KEY,
+        command TEXT NOT NULL,
+        state TEXT NOT NULL,
+        attempts INTEGER DEFAULT 0,
+        max_retries INTEGER DEFAULT 3,
+        created_at INTEGER NOT NULL,
+        updated_at INTEGER NOT NULL,
+        started_at INTEGER,
+        completed_at INTEGER,
+        next_retry_at INTEGER,
+        error_message TEXT,
+        worker_id TEXT,
+        metadata TEXT
+    )
+"""
+
+_WORKERS_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        worker_id TEXT PRIMARY KEY,
+        pid INTEGER NOT NULL,
+        started_at INTEGER NOT NULL,
+        last_heartbeat INTEGER NOT NULL,
+        status TEXT NOT NULL
+    )
+"""
+
+
+def _iso_to_us_sql(column: str) -> str:
+    """SQL expression converting an ISO-8601 text column to epoch microseconds"""
+    # isoformat() omits the fraction when it is zero, hence the padding
+    return (f"CAST(strftime('%s', {column}) AS INTEGER) * 1000000"
+            f" + CAST(substr({column} || '.000000', 21, 6) AS INTEGER)")
+
+
+def now_us() -> int:
+    """Current time as integer microseconds since the Unix epoch
+    
+    All job and worker timestamps are stored in this form.
+    """
+    return time.time_ns() // 1000
+
+
+# Hot statements are kept as module constants so every call passes the same
+# SQL text and hits the connection's prepared statement cache
+_SQL_INSERT_JOB = """
+    INSERT INTO jobs (
+        id, command, state, attempts, max_retries,
+        created_at, updated_at, metadata
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Bulk enqueue fallback once a batch has hit an existing job ID
+_SQL_INSERT_JOB_OR_IGNORE = _SQL_INSERT_JOB.replace(
+    "INSERT INTO", "INSERT OR IGNORE INTO", 1
+)
+
+_SQL_GET_JOB = "SELECT * FROM jobs WHERE id = ?"
+
+_SQL_COMPLETE_JOB = """
+    UPDATE jobs 
+    SET state = ?, completed_at = ?, updated_at = ?, error_message = ?
+    WHERE id = ?
+"""
+
+_SQL_UPDATE_STATE = """
+    UPDATE jobs 
+    SET state = ?, updated_at = ?, error_message = ?, worker_id = ?
+    WHERE id = ?
+"""
+
+# Listing clauses, shared by list_jobs and list_jobs_columnar
+_SQL_LIST_TAIL = """
+    ORDER BY created_at DESC
+    LIMIT ?
+"""
+
+_SQL_LIST_BY_STATE_TAIL = """
+    WHERE state = ?
+    ORDER BY created_at DESC
+    LIMIT ?
+"""
+
+_SQL_LIST_JOBS = "SELECT * FROM jobs " + _SQL_LIST_TAIL
+
+_SQL_LIST_JOBS_BY_STATE = "SELECT * FROM jobs " + _SQL_LIST_BY_STATE_TAIL
+
+# Worker polling query: pending jobs, or failed jobs whose retry is due
+_SQL_SELECT_NEXT_PENDING = """
+    SELECT id FROM jobs 
+    WHERE (state = ? OR (state = ? AND next_retry_at <= ?))
+    AND (worker_id IS NULL OR worker_id = '')
+    ORDER BY created_at ASC
+    LIMIT 1
+"""
+
+# Marks a job as processing by this worker and counts the attempt
+_SQL_MARK_PROCESSING = """
+    UPDATE jobs 
+    SET state = ?, 
+        worker_id = ?, 
+        started_at = ?, 
+        updated_at = ?,
+        attempts = attempts + 1
+"""
+
+# Claims the next job in a single statement, so no other worker can take it
+# between finding and marking it
+_SQL_CLAIM_NEXT = (
+    _SQL_MARK_PROCESSING
+    + "WHERE id = (" + _SQL_SELECT_NEXT_PENDING + ") RETURNING *"
+)
+
+# Fallback claim for SQLite without RETURNING; guarded against a racing claim
+_SQL_CLAIM_BY_ID = (
+    _SQL_MARK_PROCESSING
+    + "WHERE id = ? AND (worker_id IS NULL OR worker_id = '')"
+)
+
+_SQL_HAS_PENDING = "SELECT 1 FROM jobs WHERE state = ? LIMIT 1"
+
+_SQL_JOB_STATE_COUNTS = "SELECT state, n FROM job_state_counts"
+
+# workers.worker_id is the primary key, so this is a single index seek
+_SQL_WORKER_HEARTBEAT = """
+    UPDATE workers 
+    SET last_heartbeat = ?
+    WHERE worker_id = ?
+"""
+
+# Failed attempt: DLQ once attempts are exhausted, otherwise schedule a retry.
+# SET expressions all see the row's values from before the update.
+_SQL_FAIL_OR_DLQ = """
+    UPDATE jobs 
+    SET state = CASE WHEN attempts >= max_retries THEN ? ELSE ? END,
+        next_retry_at = CASE WHEN attempts >= max_retries
+                             THEN next_retry_at ELSE ? END,
+        updated_at = ?,
+        error_message = ?,
+        worker_id = ''
+    WHERE id = ?
+"""
+
+_SQL_FAIL_OR_DLQ_RETURNING = _SQL_FAIL_OR_DLQ + "RETURNING state, attempts, max_retries"
+
+_SQL_FAIL_RESULT = "SELECT state, attempts, max_retries FROM jobs WHERE id = ?"
+
+# Formatted with one placeholder per allowed source state
+_SQL_REQUEUE_JOB = """
+    UPDATE jobs 
+    SET state = ?, updated_at = ?, error_message = NULL, worker_id = ''
+    WHERE id = ? AND state IN ({placeholders})
+"""
+
+_SQL_SCHEDULE_RETRY = """
+    UPDATE jobs 
+    SET next_retry_at = ?,
+        updated_at = ?,
+        error_message = ?,
+        worker_id = '',
+        state = ?
+    WHERE id = ?
+"""
+
+_SQL_MOVE_TO_DLQ = """
+    UPDATE jobs 
+    SET state = ?, updated_at = ?, error_message = ?, worker_id = ''
+    WHERE id = ?
+"""
+
+_SQL_REGISTER_WORKER = """
+    INSERT OR REPLACE INTO workers (
+        worker_id, pid, started_at, last_heartbeat, status
+    ) VALUES (?, ?, ?, ?, ?)
+"""
+
+# Hands a departing worker's in-flight jobs back to the queue. The state is
+# a literal so the planner can use the partial idx_jobs_worker_processing.
+_SQL_RELEASE_WORKER_JOBS = """
+    UPDATE jobs 
+    SET worker_id = '', state = ?
+    WHERE worker_id = ? AND state = 'processing'
+"""
+
+_SQL_DELETE_WORKER = "DELETE FROM workers WHERE worker_id = ?"
+
+_SQL_LIST_WORKERS = "SELECT * FROM workers ORDER BY started_at ASC"
+
+# UPDATE ... RETURNING needs SQLite 3.35+
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+# Connections kept per database file, shared by every Storage in the process
+_POOL_SIZE = 8
+
+
+class _ConnectionPool:
+    """Bounded pool of SQLite connections to one database file"""
+    
+    def __init__(self, db_path: str, maxsize: int = _POOL_SIZE,
+                 pragmas: Tuple[str, ...] = _CONNECTION_PRAGMAS):
+        self.db_path = db_path
+        self.maxsize = maxsize
+        self.pragmas = pragmas
+        self._idle = queue.Queue()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly by _get_cursor
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               isolation_level=None,
+                               cached_statements=_STATEMENT_CACHE_SIZE,
+                               uri=_is_uri(self.db_path))
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+    
+    def acquire(self) -> sqlite3.Connection:
+        """Take an idle connection, opening one if the pool is not full"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            can_open = self._size < self.maxsize
+            if can_open:
+                self._size += 1
+        
+        if not can_open:
+            return self._idle.get()
+        
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+            raise
+    
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection taken with acquire()"""
+        self._idle.put(conn)
+    
+    def close_idle(self):
+        """Close connections not currently in use; new ones open on demand"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+            with self._lock:
+                self._size -= 1
+
+
+_POOLS: Dict[Tuple[str, bool], _ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _is_uri(db_path: str) -> bool:
+    """Whether `db_path` is an SQLite URI filename such as 'file:jobs.db?mode=ro'"""
+    return db_path.startswith("file:")
+
+
+def doorbell_path(db_path: str) -> Optional[str]:
+    """
+    Path of the doorbell file touched when work is queued in `db_path`
+    
+    None for ':memory:' and URIs, which have no doorbell.
+    """
+    if db_path == ":memory:" or _is_uri(db_path):
+        return None
+    return db_path + "-doorbell"
+
+
+def _get_pool(db_path: str, fast: bool = False) -> _ConnectionPool:
+    """Get the process-wide pool for a database file"""
+    key = (db_path if _is_uri(db_path) else os.path.abspath(db_path), fast)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pragmas = _FAST_CONNECTION_PRAGMAS if fast else _CONNECTION_PRAGMAS
+            pool = _POOLS[key] = _ConnectionPool(db_path, pragmas=pragmas)
+        return pool
+
+
+# Pools inherited across fork(), kept referenced so they are never closed
+_INHERITED_POOLS: List[Dict[Tuple[str, bool], _ConnectionPool]] = []
+
+
+def _forget_pools():
+    # A forked child must not use the parent's connections. They are left
+    # unclosed so that closing them cannot disturb the parent's locks.
+    global _POOLS, _POOLS_LOCK
+    _INHERITED_POOLS.append(_POOLS)
+    _POOLS = {}
+    _POOLS_LOCK = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_pools)
+
 
 class JobState:
     """Job state constants"""
@@ -19,107 +386,318 @@ class JobState:
     COMPLETED = "completed"
     FAILED = "failed"
     DLQ = "dlq"
+    
+    ALL = (PENDING, PROCESSING, COMPLETED, FAILED, DLQ)
 
 
 class Storage:
     """SQLite-based storage for job queue"""
     
-    def __init__(self, db_path: str = "queuectl.db"):
-        """Initialize storage with database path"""
+    def __init__(self, db_path: str = "queuectl.db", *, fast: bool = False,
+                 on_fetch: Optional[Callable[[Optional[Dict[str, Any]]], Any]] = None):
+        """Initialize storage with database path
+        
+        Args:
+            db_path: Database file, ':memory:', or an SQLite URI starting
+                with 'file:' (e.g. 'file:queuectl.db?mode=ro')
+            fast: Trade durability for speed (no fsyncs, in-memory journal).
+                Only for databases that may be lost, e.g. in tests.
+            on_fetch: Called with the result of every get_next_pending_job
+                (the claimed job, or None); useful for instrumentation
+        """
         self.db_path = db_path
-        self.local = threading.local()
+        self.fast = fast
+        self.on_fetch = on_fetch
+        pragmas = _FAST_CONNECTION_PRAGMAS if fast else _CONNECTION_PRAGMAS
+        if db_path == ":memory:":
+            # Every connection to :memory: is a separate database, so this
+            # Storage keeps a single private connection
+            self._pool = _ConnectionPool(db_path, maxsize=1, pragmas=pragmas)
+        else:
+            self._pool = _get_pool(db_path, fast)
+        self._doorbell_path = doorbell_path(db_path)
         self._init_db()
     
-    def _get_connection(self) -> sqlite3.Connection:
-        """Get thread-local database connection"""
-        if not hasattr(self.local, 'conn'):
-            self.local.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.local.conn.row_factory = sqlite3.Row
-        return self.local.conn
+    def _ring_doorbell(self):
+        """Touch the doorbell file so idle workers in other processes wake up"""
+        if not self._doorbell_path:
+            return
+        try:
+            os.utime(self._doorbell_path)
+        except FileNotFoundError:
+            try:
+                open(self._doorbell_path, "a").close()
+            except OSError:
+                pass
+        except OSError:
+            pass
+    
+    def doorbell_mtime(self) -> int:
+        """Modification time (ns) of the doorbell file, which changes when work is queued"""
+        if not self._doorbell_path:
+            return 0
+        try:
+            return os.stat(self._doorbell_path).st_mtime_ns
+        except OSError:
+            return 0
     
     @contextmanager
-    def _get_cursor(self):
-        """Context manager for database cursor"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+    def _connection(self):
+        """Context manager for a connection borrowed from the pool"""
+        conn = self._pool.acquire()
         try:
-            yield cursor
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
+            yield conn
         finally:
-            cursor.close()
+            self._pool.release(conn)
+    
+    @contextmanager
+    def _get_cursor(self, immediate: bool = False):
+        """
+        Context manager for a database cursor wrapped in one transaction
+        
+        Args:
+            immediate: Take the write lock when the transaction starts
+                (BEGIN IMMEDIATE) rather than on its first write, so
+                read-then-write transactions serialize cleanly
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield cursor
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise e
+            finally:
+                cursor.close()
     
     def _init_db(self):
-        """Initialize database schema"""
-        with self._get_cursor() as cursor:
-            # Jobs table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS jobs (
-                    id TEXT PRIMARY KEY,
-                    command TEXT NOT NULL,
-                    state TEXT NOT NULL,
-                    attempts INTEGER DEFAULT 0,
-                    max_retries INTEGER DEFAULT 3,
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL,
-                    started_at TEXT,
-                    completed_at TEXT,
-                    next_retry_at TEXT,
-                    error_message TEXT,
-                    worker_id TEXT,
-                    metadata TEXT
-                )
-            """)
-            
-            # Create indices for common queries
+        """Initialize database schema, migrating older databases in place"""
+        # journal_mode cannot change inside a transaction. On a read-only
+        # filesystem the switch fails and the existing journal mode is kept.
+        # Fast storages keep the in-memory journal set on each connection.
+        if not self.fast:
+            with self._connection() as conn:
+                try:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                except sqlite3.OperationalError:
+                    pass
+        
+        # A database already at the current version is opened without
+        # writing anything, so read-only commands take no write lock
+        with self._connection() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+        
+        if version < SCHEMA_VERSION:
+            # Immediate, so Storages opened concurrently wait on busy_timeout
+            # instead of failing to upgrade a read lock
+            with self._get_cursor(immediate=True) as cursor:
+                # Another process may have upgraded it while we waited
+                cursor.execute("PRAGMA user_version")
+                version = cursor.fetchone()[0]
+                if version < SCHEMA_VERSION:
+                    self._create_schema(cursor, version)
+        
+        # Rows are fetched as plain tuples; remember the jobs column order
+        with self._connection() as conn:
+            cursor = conn.execute("SELECT * FROM jobs LIMIT 0")
+            self._job_columns = tuple(column[0] for column in cursor.description)
+    
+    def _create_schema(self, cursor: sqlite3.Cursor, version: int):
+        """Create the schema, or migrate a database at an older `version`"""
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'jobs'"
+        )
+        if cursor.fetchone():
+            self._migrate(cursor, version)
+        
+        # Jobs table
+        cursor.execute(_JOBS_TABLE_DDL.format(table="jobs"))
+        
+        # Create indices for common queries. The single-column state and
+        # next_retry_at indexes are superseded by the composites below.
+        cursor.execute("DROP INDEX IF EXISTS idx_jobs_state")
+        cursor.execute("DROP INDEX IF EXISTS idx_jobs_next_retry")
+        
+        # Serves per-state listings in created_at order without a sort
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_jobs_state_created 
+            ON jobs(state, created_at)
+        """)
+        
+        # Lets the worker polling query seek straight to due jobs instead
+        # of scanning every completed job
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_jobs_state_retry 
+            ON jobs(state, next_retry_at, created_at)
+        """)
+        
+        # Finds a worker's in-flight jobs without scanning the table
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_jobs_worker_processing 
+            ON jobs(worker_id) WHERE state = 'processing'
+        """)
+        
+        # Worker tracking table
+        cursor.execute(_WORKERS_TABLE_DDL.format(table="workers"))
+        
+        # Per-state job counters, kept in step with the jobs table by
+        # triggers so status queries don't have to scan it
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS job_state_counts (
+                state TEXT PRIMARY KEY,
+                n INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        for trigger in _STATE_COUNT_TRIGGERS:
+            cursor.execute(trigger)
+        
+        if version < 2:
+            self._rebuild_state_counts(cursor)
+        
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    
+    def _migrate(self, cursor: sqlite3.Cursor, version: int):
+        """Upgrade an existing jobs table from `version` to SCHEMA_VERSION"""
+        if version < 1:
+            # next_retry_at changed from an ISO string to an integer Unix
+            # timestamp. SQLite cannot change a column type, so rebuild.
+            cursor.execute(_JOBS_TABLE_DDL.format(table="jobs_new"))
             cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_jobs_state 
-                ON jobs(state)
+                INSERT INTO jobs_new
+                SELECT id, command, state, attempts, max_retries,
+                       created_at, updated_at, started_at, completed_at,
+                       CAST(strftime('%s', next_retry_at) AS INTEGER),
+                       error_message, worker_id, metadata
+                FROM jobs
             """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_jobs_next_retry 
-                ON jobs(next_retry_at)
+            cursor.execute("DROP TABLE jobs")
+            cursor.execute("ALTER TABLE jobs_new RENAME TO jobs")
+        
+        if version < 3:
+            # Timestamps changed from ISO strings (next_retry_at: integer
+            # seconds) to integer microseconds since the epoch
+            cursor.execute(_JOBS_TABLE_DDL.format(table="jobs_new"))
+            cursor.execute(f"""
+                INSERT INTO jobs_new
+                SELECT id, command, state, attempts, max_retries,
+                       {_iso_to_us_sql('created_at')},
+                       {_iso_to_us_sql('updated_at')},
+                       {_iso_to_us_sql('started_at')},
+                       {_iso_to_us_sql('completed_at')},
+                       next_retry_at * 1000000,
+                       error_message, worker_id, metadata
+                FROM jobs
             """)
+            cursor.execute("DROP TABLE jobs")
+            cursor.execute("ALTER TABLE jobs_new RENAME TO jobs")
             
-            # Worker tracking table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS workers (
-                    worker_id TEXT PRIMARY KEY,
-                    pid INTEGER NOT NULL,
-                    started_at TEXT NOT NULL,
-                    last_heartbeat TEXT NOT NULL,
-                    status TEXT NOT NULL
-                )
+            cursor.execute(_WORKERS_TABLE_DDL.format(table="workers"))
+            cursor.execute(_WORKERS_TABLE_DDL.format(table="workers_new"))
+            cursor.execute(f"""
+                INSERT INTO workers_new
+                SELECT worker_id, pid,
+                       {_iso_to_us_sql('started_at')},
+                       {_iso_to_us_sql('last_heartbeat')},
+                       status
+                FROM workers
             """)
+            cursor.execute("DROP TABLE workers")
+            cursor.execute("ALTER TABLE workers_new RENAME TO workers")
+    
+    def _rebuild_state_counts(self, cursor: sqlite3.Cursor):
+        """Recount jobs per state into job_state_counts (one full scan)"""
+        cursor.execute("DELETE FROM job_state_counts")
+        cursor.execute("""
+            INSERT INTO job_state_counts (state, n)
+            SELECT state, COUNT(*) FROM jobs GROUP BY state
+        """)
+        cursor.executemany(
+            "INSERT OR IGNORE INTO job_state_counts (state, n) VALUES (?, 0)",
+            [(state,) for state in JobState.ALL]
+        )
     
     def enqueue_job(self, job_id: str, command: str, max_retries: int = 3, 
                     metadata: Optional[Dict] = None) -> bool:
         """Add a new job to the queue"""
-        now = datetime.utcnow().isoformat()
-        metadata_json = json.dumps(metadata) if metadata else None
+        now = now_us()
+        metadata_json = dumps(metadata) if metadata else None
         
         try:
             with self._get_cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO jobs (
-                        id, command, state, attempts, max_retries,
-                        created_at, updated_at, metadata
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
+                cursor.execute(_SQL_INSERT_JOB, (
                     job_id, command, JobState.PENDING, 0, max_retries,
                     now, now, metadata_json
                 ))
+            self._ring_doorbell()
             return True
         except sqlite3.IntegrityError:
             return False  # Job already exists
     
+    def enqueue_jobs_bulk(self, rows: List[tuple]) -> bool:
+        """
+        Add many jobs to the queue in a single transaction
+        
+        Args:
+            rows: List of (job_id, command, max_retries, metadata) tuples
+        
+        Returns:
+            True if all jobs were inserted, False if any job already exists
+            (in which case none are inserted)
+        """
+        params = self._job_insert_params(rows)
+        
+        try:
+            with self._get_cursor() as cursor:
+                cursor.executemany(_SQL_INSERT_JOB, params)
+            self._ring_doorbell()
+            return True
+        except sqlite3.IntegrityError:
+            return False  # At least one job already exists
+    
+    def enqueue_jobs(self, rows: List[tuple]) -> int:
+        """
+        Add many jobs to the queue in a single transaction, skipping any job
+        whose ID already exists
+        
+        Args:
+            rows: List of (job_id, command, max_retries, metadata) tuples
+        
+        Returns:
+            Number of jobs inserted
+        """
+        params = self._job_insert_params(rows)
+        
+        try:
+            with self._get_cursor() as cursor:
+                cursor.executemany(_SQL_INSERT_JOB, params)
+            self._ring_doorbell()
+            return len(params)
+        except sqlite3.IntegrityError:
+            pass
+        
+        # Some IDs already exist; redo the batch without them
+        with self._get_cursor() as cursor:
+            cursor.executemany(_SQL_INSERT_JOB_OR_IGNORE, params)
+            inserted = cursor.rowcount
+        if inserted:
+            self._ring_doorbell()
+        return inserted
+    
+    def _job_insert_params(self, rows: List[tuple]) -> List[tuple]:
+        """Build _SQL_INSERT_JOB parameters for (job_id, command, max_retries, metadata) rows"""
+        now = now_us()
+        return [
+            (job_id, command, JobState.PENDING, 0, max_retries, now, now,
+             dumps(metadata) if metadata else None)
+            for job_id, command, max_retries, metadata in rows
+        ]
+    
     def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
         """Get job by ID"""
         with self._get_cursor() as cursor:
-            cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            cursor.execute(_SQL_GET_JOB, (job_id,))
             row = cursor.fetchone()
             if row:
                 return self._row_to_dict(row)
@@ -127,93 +705,141 @@ class Storage:
     
     def get_next_pending_job(self, worker_id: str) -> Optional[Dict[str, Any]]:
         """Get next pending job and mark it as processing"""
-        now = datetime.utcnow().isoformat()
+        job = self.claim_next(worker_id)
+        if self.on_fetch is not None:
+            self.on_fetch(job)
+        return job
+    
+    def claim_next(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Atomically claim the next runnable job for a worker
         
-        with self._get_cursor() as cursor:
-            # Find pending jobs or failed jobs ready for retry
-            cursor.execute("""
-                SELECT * FROM jobs 
-                WHERE (state = ? OR (state = ? AND next_retry_at <= ?))
-                AND (worker_id IS NULL OR worker_id = '')
-                ORDER BY created_at ASC
-                LIMIT 1
-            """, (JobState.PENDING, JobState.FAILED, now))
+        Picks the oldest pending job (or failed job whose retry is due), marks
+        it as processing and increments its attempts. A successful claim also
+        refreshes the worker's heartbeat in the same transaction, so workers
+        that keep finding jobs need no separate heartbeat commits.
+        
+        Returns:
+            The claimed job, or None if no job is ready
+        """
+        now = now_us()
+        
+        with self._get_cursor(immediate=True) as cursor:
+            if _HAS_RETURNING:
+                cursor.execute(_SQL_CLAIM_NEXT, (
+                    JobState.PROCESSING, worker_id, now, now,
+                    JobState.PENDING, JobState.FAILED, now
+                ))
+                row = cursor.fetchone()
+            else:
+                # Find pending jobs or failed jobs ready for retry
+                cursor.execute(_SQL_SELECT_NEXT_PENDING,
+                               (JobState.PENDING, JobState.FAILED, now))
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                
+                job_id = row[0]
+                cursor.execute(_SQL_CLAIM_BY_ID,
+                               (JobState.PROCESSING, worker_id, now, now, job_id))
+                
+                # Check if update was successful (no race condition)
+                if cursor.rowcount == 0:
+                    return None
+                
+                cursor.execute(_SQL_GET_JOB, (job_id,))
+                row = cursor.fetchone()
             
-            row = cursor.fetchone()
             if not row:
                 return None
             
-            job = self._row_to_dict(row)
-            
-            # Mark as processing and increment attempts atomically
-            cursor.execute("""
-                UPDATE jobs 
-                SET state = ?, 
-                    worker_id = ?, 
-                    started_at = ?, 
-                    updated_at = ?,
-                    attempts = attempts + 1
-                WHERE id = ? AND (worker_id IS NULL OR worker_id = '')
-            """, (JobState.PROCESSING, worker_id, now, now, job['id']))
-            
-            # Check if update was successful (no race condition)
-            if cursor.rowcount > 0:
-                job['state'] = JobState.PROCESSING
-                job['worker_id'] = worker_id
-                job['attempts'] = job['attempts'] + 1  # Update in-memory value
-                return job
-            
-        return None
+            cursor.execute(_SQL_WORKER_HEARTBEAT, (now, worker_id))
+            return self._row_to_dict(row)
     
     def update_job_state(self, job_id: str, state: str, error_message: Optional[str] = None,
                         worker_id: Optional[str] = None) -> bool:
         """Update job state"""
-        now = datetime.utcnow().isoformat()
+        now = now_us()
         
         with self._get_cursor() as cursor:
             if state == JobState.COMPLETED:
-                cursor.execute("""
-                    UPDATE jobs 
-                    SET state = ?, completed_at = ?, updated_at = ?, error_message = ?
-                    WHERE id = ?
-                """, (state, now, now, error_message, job_id))
+                cursor.execute(_SQL_COMPLETE_JOB,
+                               (state, now, now, error_message, job_id))
             else:
-                cursor.execute("""
-                    UPDATE jobs 
-                    SET state = ?, updated_at = ?, error_message = ?, worker_id = ?
-                    WHERE id = ?
-                """, (state, now, error_message, worker_id or '', job_id))
+                cursor.execute(_SQL_UPDATE_STATE,
+                               (state, now, error_message, worker_id or '', job_id))
             
             return cursor.rowcount > 0
     
-    def schedule_retry(self, job_id: str, next_retry_at: str, 
+    def requeue_job(self, job_id: str, from_states: List[str]) -> bool:
+        """
+        Move a job back to pending, only if it is currently in one of `from_states`
+        
+        Returns:
+            True if the job was requeued
+        """
+        now = now_us()
+        placeholders = ", ".join("?" * len(from_states))
+        
+        with self._get_cursor() as cursor:
+            cursor.execute(_SQL_REQUEUE_JOB.format(placeholders=placeholders),
+                           (JobState.PENDING, now, job_id, *from_states))
+            requeued = cursor.rowcount > 0
+        
+        if requeued:
+            self._ring_doorbell()
+        return requeued
+    
+    def atomic_fail_or_dlq(self, job_id: str, error_message: Optional[str],
+                           next_retry_at: int) -> Optional[Dict[str, Any]]:
+        """
+        Record a failed attempt in a single UPDATE
+        
+        The job moves to the DLQ if it has used up its attempts, otherwise it
+        is scheduled for retry at `next_retry_at` (epoch microseconds, see now_us).
+        
+        Returns:
+            Dictionary with the job's new 'state', 'attempts' and 'max_retries',
+            or None if the job does not exist
+        """
+        now = now_us()
+        params = (JobState.DLQ, JobState.FAILED, next_retry_at, now,
+                  error_message, job_id)
+        
+        with self._get_cursor() as cursor:
+            if _HAS_RETURNING:
+                cursor.execute(_SQL_FAIL_OR_DLQ_RETURNING, params)
+                row = cursor.fetchone()
+            else:
+                cursor.execute(_SQL_FAIL_OR_DLQ, params)
+                cursor.execute(_SQL_FAIL_RESULT, (job_id,))
+                row = cursor.fetchone()
+            
+            return dict(zip(('state', 'attempts', 'max_retries'), row)) if row else None
+    
+    def schedule_retry(self, job_id: str, next_retry_at: int, 
                       error_message: Optional[str] = None) -> bool:
-        """Schedule job for retry (attempts already incremented on claim)"""
-        now = datetime.utcnow().isoformat()
+        """
+        Schedule job for retry (attempts already incremented on claim)
+        
+        Args:
+            next_retry_at: Epoch microseconds (see now_us) after which the job may run
+        """
+        now = now_us()
         
         with self._get_cursor() as cursor:
-            cursor.execute("""
-                UPDATE jobs 
-                SET next_retry_at = ?,
-                    updated_at = ?,
-                    error_message = ?,
-                    worker_id = '',
-                    state = ?
-                WHERE id = ?
-            """, (next_retry_at, now, error_message, JobState.FAILED, job_id))
+            cursor.execute(_SQL_SCHEDULE_RETRY,
+                           (next_retry_at, now, error_message, JobState.FAILED, job_id))
             
             return cursor.rowcount > 0
     
     def move_to_dlq(self, job_id: str, error_message: Optional[str] = None) -> bool:
         """Move job to Dead Letter Queue"""
-        now = datetime.utcnow().isoformat()
+        now = now_us()
         
         with self._get_cursor() as cursor:
-            cursor.execute("""
-                UPDATE jobs 
-                SET state = ?, updated_at = ?, error_message = ?, worker_id = ''
-                WHERE id = ?
-            """, (JobState.DLQ, now, error_message, job_id))
+            cursor.execute(_SQL_MOVE_TO_DLQ,
+                           (JobState.DLQ, now, error_message, job_id))
             
             return cursor.rowcount > 0
     
@@ -221,68 +847,75 @@ class Storage:
         """List jobs, optionally filtered by state"""
         with self._get_cursor() as cursor:
             if state:
-                cursor.execute("""
-                    SELECT * FROM jobs 
-                    WHERE state = ?
-                    ORDER BY created_at DESC
-                    LIMIT ?
-                """, (state, limit))
+                cursor.execute(_SQL_LIST_JOBS_BY_STATE, (state, limit))
             else:
-                cursor.execute("""
-                    SELECT * FROM jobs 
-                    ORDER BY created_at DESC
-                    LIMIT ?
-                """, (limit,))
+                cursor.execute(_SQL_LIST_JOBS, (limit,))
             
             return [self._row_to_dict(row) for row in cursor.fetchall()]
     
+    def list_jobs_columnar(self, columns: Sequence[str], state: Optional[str] = None,
+                           limit: int = 100) -> Dict[str, list]:
+        """
+        List jobs as columns rather than rows, for table rendering
+        
+        Args:
+            columns: Job columns to fetch, e.g. ('id', 'state')
+        
+        Returns:
+            Dictionary mapping each requested column to a list of values, in
+            the same order as list_jobs. Metadata is left as its JSON text.
+        """
+        unknown = set(columns) - set(self._job_columns)
+        if unknown:
+            raise ValueError(f"Unknown job column(s): {', '.join(sorted(unknown))}")
+        
+        # Column names are checked above, so they are safe to interpolate
+        select = "SELECT " + ", ".join(columns) + " FROM jobs "
+        with self._connection() as conn:
+            if state:
+                rows = conn.execute(select + _SQL_LIST_BY_STATE_TAIL, (state, limit)).fetchall()
+            else:
+                rows = conn.execute(select + _SQL_LIST_TAIL, (limit,)).fetchall()
+        
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+        return {column: list(col) for column, col in zip(columns, values)}
+    
+    def has_pending(self) -> bool:
+        """Check whether any job is pending (a single index probe)"""
+        with self._connection() as conn:
+            return conn.execute(_SQL_HAS_PENDING, (JobState.PENDING,)).fetchone() is not None
+    
     def get_job_stats(self) -> Dict[str, int]:
-        """Get job statistics by state"""
-        with self._get_cursor() as cursor:
-            cursor.execute("""
-                SELECT state, COUNT(*) as count 
-                FROM jobs 
-                GROUP BY state
-            """)
-            
-            stats = {
-                JobState.PENDING: 0,
-                JobState.PROCESSING: 0,
-                JobState.COMPLETED: 0,
-                JobState.FAILED: 0,
-                JobState.DLQ: 0
-            }
-            
-            for row in cursor.fetchall():
-                stats[row['state']] = row['count']
-            
-            return stats
+        """
+        Get job statistics by state
+        
+        Reads the trigger-maintained job_state_counts table, so the cost does
+        not depend on the number of jobs. A single SELECT is atomic on its
+        own, so no explicit transaction is opened.
+        """
+        stats = dict.fromkeys(JobState.ALL, 0)
+        with self._connection() as conn:
+            stats.update(conn.execute(_SQL_JOB_STATE_COUNTS).fetchall())
+        return stats
     
     def register_worker(self, worker_id: str, pid: int) -> bool:
         """Register a worker"""
-        now = datetime.utcnow().isoformat()
+        now = now_us()
         
         try:
             with self._get_cursor() as cursor:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO workers (
-                        worker_id, pid, started_at, last_heartbeat, status
-                    ) VALUES (?, ?, ?, ?, ?)
-                """, (worker_id, pid, now, now, "active"))
+                cursor.execute(_SQL_REGISTER_WORKER,
+                               (worker_id, pid, now, now, "active"))
             return True
         except Exception:
             return False
     
     def update_worker_heartbeat(self, worker_id: str) -> bool:
         """Update worker heartbeat"""
-        now = datetime.utcnow().isoformat()
+        now = now_us()
         
         with self._get_cursor() as cursor:
-            cursor.execute("""
-                UPDATE workers 
-                SET last_heartbeat = ?
-                WHERE worker_id = ?
-            """, (now, worker_id))
+            cursor.execute(_SQL_WORKER_HEARTBEAT, (now, worker_id))
             
             return cursor.rowcount > 0
     
@@ -290,36 +923,34 @@ class Storage:
         """Deregister a worker"""
         with self._get_cursor() as cursor:
             # Release jobs held by this worker
-            cursor.execute("""
-                UPDATE jobs 
-                SET worker_id = '', state = ?
-                WHERE worker_id = ? AND state = ?
-            """, (JobState.PENDING, worker_id, JobState.PROCESSING))
+            cursor.execute(_SQL_RELEASE_WORKER_JOBS, (JobState.PENDING, worker_id))
+            released = cursor.rowcount
             
             # Remove worker
-            cursor.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
-            
-            return True
+            cursor.execute(_SQL_DELETE_WORKER, (worker_id,))
+        
+        if released > 0:
+            self._ring_doorbell()
+        return True
     
     def list_workers(self) -> List[Dict[str, Any]]:
         """List all registered workers"""
         with self._get_cursor() as cursor:
-            cursor.execute("SELECT * FROM workers ORDER BY started_at ASC")
-            return [self._row_to_dict(row) for row in cursor.fetchall()]
+            cursor.execute(_SQL_LIST_WORKERS)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
     
-    def _row_to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
-        """Convert SQLite row to dictionary"""
-        d = dict(row)
+    def _row_to_dict(self, row: tuple) -> Dict[str, Any]:
+        """Convert a jobs table row to a dictionary"""
+        d = dict(zip(self._job_columns, row))
         # Parse JSON metadata if present
-        if 'metadata' in d and d['metadata']:
+        if d['metadata']:
             try:
-                d['metadata'] = json.loads(d['metadata'])
-            except json.JSONDecodeError:
+                d['metadata'] = loads(d['metadata'])
+            except JSONDecodeError:
                 d['metadata'] = None
         return d
     
     def close(self):
-        """Close database connection"""
-        if hasattr(self.local, 'conn'):
-            self.local.conn.close()
-            delattr(self.local, 'conn')
+        """Close idle pooled connections (they are reopened on next use)"""
+        self._pool.close_idle()
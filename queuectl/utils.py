@@ -3,18 +3,44 @@ Utility functions for QueueCTL
 Helper functions for command execution, logging, and common operations
 """
 
+import errno
 import subprocess
 import logging
 import os
+import re
+import selectors
+import shutil
 import signal
-from typing import Tuple, Optional
-from datetime import datetime
+import time
+from functools import lru_cache
+from typing import List, Tuple, Optional, Union
+from datetime import datetime, timezone
+
+
+# Anything the shell would interpret (quoting, expansion, globbing,
+# redirection, pipelines, command lists, comments, env assignments)
+_SHELL_META = re.compile(r'[|&;<>()$`\\"\'*?\[\]#~=%!{}\n]')
+
+# Errors from exec'ing a simple command directly that the shell handles
+# (ENOEXEC: no #! line) or reports with an exit code; these run via /bin/sh
+_SHELL_FALLBACK_ERRNOS = (errno.ENOEXEC, errno.ENOENT, errno.EACCES)
+
+# Only the last OUTPUT_TAIL_BYTES of a job's stdout and stderr are kept, so
+# worker memory stays bounded however much a job prints
+OUTPUT_TAIL_BYTES = 64 * 1024
+
+
+# log_level config values accepted by setup_logging
+_LEVEL_MAP = {
+    name: getattr(logging, name)
+    for name in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+}
 
 
 def setup_logging(log_level: str = "INFO") -> logging.Logger:
     """Setup logging configuration"""
     logger = logging.getLogger("queuectl")
-    logger.setLevel(getattr(logging, log_level.upper(), logging.INFO))
+    logger.setLevel(_LEVEL_MAP.get(log_level.upper(), logging.INFO))
     
     # Console handler
     if not logger.handlers:
@@ -37,54 +63,163 @@ def execute_command(command: str, timeout: int = 300) -> Tuple[int, str, str]:
         timeout: Command timeout in seconds
     
     Returns:
-        Tuple of (exit_code, stdout, stderr)
+        Tuple of (exit_code, stdout, stderr); stdout and stderr are
+        truncated to their last OUTPUT_TAIL_BYTES
     """
     logger = logging.getLogger("queuectl")
     
     try:
-        # Execute command in shell
-        result = subprocess.run(
-            command,
-            shell=True,
-            capture_output=True,
-            text=True,
-            timeout=timeout
-        )
+        # Simple commands are exec'd directly, saving the /bin/sh process,
+        # from their already resolved path so exec doesn't search PATH again
+        simple = _simple_argv(command)
+        if simple is None:
+            executable, args = None, command
+        else:
+            executable, args = simple
+        
+        if os.name == "nt":
+            # selectors cannot wait on pipes on Windows
+            result = subprocess.run(args, shell=simple is None, capture_output=True,
+                                    timeout=timeout)
+            return (result.returncode,
+                    _decode_tail(result.stdout[-OUTPUT_TAIL_BYTES:]),
+                    _decode_tail(result.stderr[-OUTPUT_TAIL_BYTES:]))
+        
+        if simple is None:
+            return _run_capturing_tail(args, shell=True, timeout=timeout)
         
-        return (result.returncode, result.stdout, result.stderr)
+        try:
+            return _run_capturing_tail(args, shell=False, timeout=timeout,
+                                       executable=executable)
+        except OSError as e:
+            if e.errno not in _SHELL_FALLBACK_ERRNOS:
+                raise
+            # /bin/sh runs scripts without a #! line itself, and reports a
+            # program removed or replaced since it was looked up (exit 127)
+            _which.cache_clear()
+            return _run_capturing_tail(command, shell=True, timeout=timeout)
         
     except subprocess.TimeoutExpired:
-        logger.error(f"Command timed out after {timeout} seconds: {command}")
+        logger.error("Command timed out after %s seconds: %s", timeout, command)
         return (-1, "", f"Command timed out after {timeout} seconds")
     
     except Exception as e:
-        logger.error(f"Error executing command: {command} - {str(e)}")
+        logger.error("Error executing command: %s - %s", command, e)
         return (-1, "", str(e))
 
 
-def format_datetime(dt_string: Optional[str]) -> str:
-    """Format ISO datetime string to readable format"""
+def _run_capturing_tail(args, shell: bool, timeout: float,
+                        executable: Optional[str] = None) -> Tuple[int, str, str]:
+    """Run a command, draining both pipes as output arrives and keeping only their tails"""
+    deadline = time.monotonic() + timeout
+    
+    with subprocess.Popen(args, shell=shell, executable=executable,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+        tails = {proc.stdout: bytearray(), proc.stderr: bytearray()}
+        
+        with selectors.DefaultSelector() as selector:
+            for pipe in tails:
+                selector.register(pipe, selectors.EVENT_READ)
+            
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    proc.kill()
+                    raise subprocess.TimeoutExpired(args, timeout)
+                
+                for key, _ in selector.select(remaining):
+                    chunk = os.read(key.fd, 65536)
+                    if not chunk:
+                        selector.unregister(key.fileobj)
+                        continue
+                    tail = tails[key.fileobj]
+                    tail += chunk
+                    if len(tail) > OUTPUT_TAIL_BYTES:
+                        del tail[:-OUTPUT_TAIL_BYTES]
+        
+        try:
+            returncode = proc.wait(timeout=max(0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            raise
+        
+        return (returncode, _decode_tail(tails[proc.stdout]),
+                _decode_tail(tails[proc.stderr]))
+
+
+def _decode_tail(data: bytes) -> str:
+    """Decode captured output; a tail may start mid-character"""
+    return data.decode(errors="replace")
+
+
+@lru_cache(maxsize=256)
+def _which(name: str, path: Optional[str]) -> Optional[str]:
+    """shutil.which, memoized per PATH value"""
+    return shutil.which(name, path=path)
+
+
+def _simple_argv(command: str) -> Optional[Tuple[str, List[str]]]:
+    """
+    Split `command` into an argv if it can run without a shell
+    
+    Returns (executable, argv), where executable is argv[0] resolved on
+    PATH (memoized). argv[0] itself is left as written, for programs that
+    look at their own name.
+    
+    Returns None when the command uses shell syntax, names a shell builtin
+    or a program not on PATH (so the shell reports it as before), or on
+    Windows, where cmd.exe semantics differ.
+    """
+    if os.name == "nt" or _SHELL_META.search(command):
+        return None
+    
+    argv = command.split()
+    if not argv:
+        return None
+    executable = _which(argv[0], os.environ.get("PATH"))
+    if not executable:
+        return None
+    return executable, argv
+
+
+@lru_cache(maxsize=4096)
+def _parse_iso(value: str) -> datetime:
+    """datetime.fromisoformat, memoized; listings repeat the same timestamps"""
+    return datetime.fromisoformat(value)
+
+
+def _to_datetime(value: Union[str, int, float]) -> datetime:
+    """Parse a stored timestamp: epoch microseconds, or a legacy ISO string"""
+    if isinstance(value, (int, float)):
+        # Naive UTC, like the legacy ISO strings
+        return datetime.fromtimestamp(value / 1_000_000, timezone.utc).replace(tzinfo=None)
+    return _parse_iso(value)
+
+
+def format_datetime(dt_string: Optional[Union[str, int]]) -> str:
+    """Format a stored timestamp (epoch microseconds or ISO string) to readable format"""
     if not dt_string:
         return "N/A"
     
     try:
-        dt = datetime.fromisoformat(dt_string)
-        return dt.strftime("%Y-%m-%d %H:%M:%S")
-    except (ValueError, AttributeError):
-        return dt_string
+        return _to_datetime(dt_string).strftime("%Y-%m-%d %H:%M:%S")
+    except (ValueError, AttributeError, OverflowError, OSError):
+        return str(dt_string)
 
 
-def format_duration(start: Optional[str], end: Optional[str]) -> str:
-    """Calculate and format duration between two ISO datetime strings"""
+def format_duration(start: Optional[Union[str, int]], end: Optional[Union[str, int]]) -> str:
+    """Calculate and format duration between two stored timestamps"""
     if not start or not end:
         return "N/A"
     
     try:
-        start_dt = datetime.fromisoformat(start)
-        end_dt = datetime.fromisoformat(end)
-        duration = end_dt - start_dt
+        if isinstance(start, int) and isinstance(end, int):
+            # Epoch microseconds: plain integer arithmetic
+            total_seconds = (end - start) // 1_000_000
+        else:
+            duration = _to_datetime(end) - _to_datetime(start)
+            total_seconds = int(duration.total_seconds())
         
-        total_seconds = int(duration.total_seconds())
         hours, remainder = divmod(total_seconds, 3600)
         minutes, seconds = divmod(remainder, 60)
         
@@ -94,7 +229,7 @@ def format_duration(start: Optional[str], end: Optional[str]) -> str:
             return f"{minutes}m {seconds}s"
         else:
             return f"{seconds}s"
-    except (ValueError, AttributeError):
+    except (ValueError, AttributeError, OverflowError, OSError):
         return "N/A"
 
 
@@ -104,22 +239,29 @@ def get_pid_file() -> str:
 
 
 def save_worker_pids(pids: list):
-    """Save worker PIDs to file"""
+    """Save worker PIDs to file
+    
+    Written to a temporary file and renamed into place, so a crash never
+    leaves a truncated PID file behind.
+    """
     pid_file = get_pid_file()
-    with open(pid_file, 'w') as f:
-        f.write('\n'.join(map(str, pids)))
+    tmp_path = pid_file + ".tmp"
+    payload = '\n'.join(map(str, pids)).encode()
+    
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, payload)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, pid_file)
 
 
 def load_worker_pids() -> list:
     """Load worker PIDs from file"""
-    pid_file = get_pid_file()
-    if not os.path.exists(pid_file):
-        return []
-    
     try:
-        with open(pid_file, 'r') as f:
-            pids = [int(line.strip()) for line in f if line.strip()]
-        return pids
+        with open(get_pid_file(), 'rb') as f:
+            return list(map(int, f.read().split()))
     except (ValueError, IOError):
         return []
 
@@ -177,7 +319,6 @@ def terminate_process(pid: int, timeout: int = 5) -> bool:
             os.kill(pid, signal.SIGTERM)
             
             # Wait for process to terminate
-            import time
             for _ in range(timeout * 10):
                 if not is_process_running(pid):
                     return True
@@ -198,6 +339,45 @@ def truncate_string(s: str, max_length: int = 50) -> str:
     return s[:max_length-3] + "..."
 
 
+def format_columns(columns: list, headers: list, max_width: int = 60) -> str:
+    """
+    Format a table given as one list of values per column
+    
+    Renders plain text with a dashed rule under the headers, as a lightweight
+    alternative to tabulate for large listings. Numbers are right-aligned.
+    Each column is converted and measured in a single pass over its own values.
+    
+    Args:
+        columns: One list of cell values per column
+        headers: Column headers
+        max_width: Cells wider than this are truncated
+    
+    Returns:
+        The formatted table
+    """
+    cells = []
+    widths = []
+    numeric = []
+    
+    for header, values in zip(headers, columns):
+        col = [truncate_string(str(v), max_width) for v in values]
+        cells.append(col)
+        widths.append(max(len(truncate_string(str(header), max_width)),
+                          max(map(len, col), default=0)))
+        numeric.append(bool(values) and all(isinstance(v, (int, float)) for v in values))
+    
+    def render(row):
+        return "  ".join(
+            c.rjust(w) if num else c.ljust(w)
+            for c, w, num in zip(row, widths, numeric)
+        ).rstrip()
+    
+    header_cells = [truncate_string(str(h), max_width) for h in headers]
+    lines = [render(header_cells), "  ".join("-" * w for w in widths)]
+    lines.extend(render(row) for row in zip(*cells))
+    return "\n".join(lines)
+
+
 def validate_job_data(job_data: dict) -> Tuple[bool, Optional[str]]:
     """
     Validate job data structure
@@ -8,10 +8,11 @@ import signal
 import sys
 import os
 import multiprocessing
-from typing import Optional
+import threading
+from typing import Callable, Dict, Optional, Tuple
 import logging
 
-from .storage import Storage, JobState
+from .storage import Storage
 from .queue import Queue
 from .config import get_config
 from .utils import execute_command, setup_logging, save_worker_pids
@@ -20,13 +21,24 @@ from .utils import execute_command, setup_logging, save_worker_pids
 class Worker:
     """Worker process for executing jobs"""
     
-    def __init__(self, worker_id: str, queue: Optional[Queue] = None):
-        """Initialize worker"""
+    def __init__(self, worker_id: str, queue: Optional[Queue] = None,
+                 executor: Optional[Callable[..., Tuple[int, str, str]]] = None):
+        """Initialize worker
+        
+        Args:
+            executor: Runs a job's command; called as executor(command, timeout=...)
+                and returns (exit_code, stdout, stderr). Defaults to execute_command.
+        """
         self.worker_id = worker_id
-        self.config = get_config()
+        # Only close a queue this worker created; a caller's queue (and its
+        # storage) may still be in use after the worker stops
+        self._owns_queue = queue is None
         self.queue = queue or Queue()
+        self.config = self.queue.config
+        self.executor = executor or execute_command
         self.storage = self.queue.storage
-        self.running = True
+        self._stop = threading.Event()
+        self._deadline = None  # time.monotonic() value at which to stop
         self.logger = setup_logging(self.config.get("log_level", "INFO"))
         
         # Setup signal handlers for graceful shutdown
@@ -35,8 +47,36 @@ class Worker:
     
     def _signal_handler(self, signum, frame):
         """Handle shutdown signals"""
-        self.logger.info(f"Worker {self.worker_id} received shutdown signal")
-        self.running = False
+        self.logger.info("Worker %s received shutdown signal", self.worker_id)
+        self.stop()
+    
+    def stop(self):
+        """Ask the worker loop to exit; an idle worker wakes up immediately
+        
+        The current job, if any, is allowed to finish first.
+        """
+        self._stop.set()
+        self.queue.wake_waiters()
+    
+    @property
+    def running(self) -> bool:
+        """False once stop() has been called"""
+        return not self._stop.is_set()
+    
+    @running.setter
+    def running(self, value: bool):
+        if value:
+            self._stop.clear()
+        else:
+            self.stop()
+    
+    def stop_after(self, seconds: float):
+        """Stop the worker loop once `seconds` have elapsed from now
+        
+        The current job is allowed to finish; the deadline is checked between
+        jobs and bounds how long the worker waits for new work.
+        """
+        self._deadline = time.monotonic() + seconds
     
     def start(self, exit_on_idle: bool = False, max_idle_seconds: int = 10):
         """Start worker loop
@@ -48,7 +88,7 @@ class Worker:
                 exit_on_idle is True.
         """
         pid = os.getpid()
-        self.logger.info(f"Worker {self.worker_id} started (PID: {pid})")
+        self.logger.info("Worker %s started (PID: %s)", self.worker_id, pid)
         
         # Register worker
         self.storage.register_worker(self.worker_id, pid)
@@ -59,16 +99,22 @@ class Worker:
         idle_start = None
         
         try:
-            while self.running:
-                # Update heartbeat periodically
+            while not self._stop.is_set():
+                if self._deadline is not None and time.monotonic() >= self._deadline:
+                    self.logger.info("Worker %s reached its stop deadline", self.worker_id)
+                    break
+                
+                # Get next job; a successful claim also refreshes the heartbeat
+                job = self.storage.get_next_pending_job(self.worker_id)
+                
+                # Otherwise update the heartbeat on its own, periodically
                 current_time = time.time()
-                if current_time - last_heartbeat >= heartbeat_interval:
+                if job:
+                    last_heartbeat = current_time
+                elif current_time - last_heartbeat >= heartbeat_interval:
                     self.storage.update_worker_heartbeat(self.worker_id)
                     last_heartbeat = current_time
                 
-                # Get next job
-                job = self.storage.get_next_pending_job(self.worker_id)
-                
                 if job:
                     # Reset idle timer when work is found
                     idle_start = None
@@ -82,56 +128,94 @@ class Worker:
                             idle_time = time.time() - idle_start
                             # Check actual pending jobs count to avoid racey exits
                             try:
-                                stats = self.storage.get_job_stats()
-                                pending = stats.get(JobState.PENDING, 0)
+                                pending = self.storage.has_pending()
                             except Exception:
-                                pending = 0
+                                pending = False
 
-                            if pending == 0 and idle_time >= max_idle_seconds:
+                            if not pending and idle_time >= max_idle_seconds:
                                 self.logger.info(
-                                    f"Worker {self.worker_id} exiting after {int(idle_time)}s idle"
+                                    "Worker %s exiting after %ds idle", self.worker_id, idle_time
                                 )
                                 break
 
-                    # Sleep briefly before next poll
-                    time.sleep(poll_interval)
+                    # Wait for new work (or the next poll) before trying again
+                    wait = poll_interval
+                    if self._deadline is not None:
+                        wait = max(0, min(wait, self._deadline - time.monotonic()))
+                    self.queue.wait_for_jobs(wait, stop=self._stop)
         
         except Exception as e:
-            self.logger.error(f"Worker {self.worker_id} encountered error: {str(e)}")
+            self.logger.error("Worker %s encountered error: %s", self.worker_id, e)
         
         finally:
             # Cleanup
-            self.logger.info(f"Worker {self.worker_id} shutting down")
+            self.logger.info("Worker %s shutting down", self.worker_id)
             self.storage.deregister_worker(self.worker_id)
-            self.queue.close()
+            if self._owns_queue:
+                self.queue.close()
     
     def _process_job(self, job: dict):
         """Process a single job"""
         job_id = job['id']
         command = job['command']
         
-        self.logger.info(f"Worker {self.worker_id} processing job {job_id}: {command}")
+        self.logger.info("Worker %s processing job %s: %s", self.worker_id, job_id, command)
         
         # Execute command
         timeout = self.config.job_timeout
-        exit_code, stdout, stderr = execute_command(command, timeout=timeout)
+        exit_code, stdout, stderr = self.executor(command, timeout=timeout)
         
         if exit_code == 0:
             # Job succeeded
-            self.logger.info(f"Job {job_id} completed successfully")
+            self.logger.info("Job %s completed successfully", job_id)
             self.queue.handle_job_success(job_id, self.worker_id)
         else:
             # Job failed
             error_message = f"Exit code {exit_code}: {stderr[:500]}"
-            self.logger.warning(f"Job {job_id} failed: {error_message}")
+            self.logger.warning("Job %s failed: %s", job_id, error_message)
             
             result = self.queue.handle_job_failure(
                 job_id=job_id,
                 error_message=error_message,
-                worker_id=self.worker_id
+                worker_id=self.worker_id,
+                attempts=job['attempts']
             )
             
-            self.logger.info(f"Job {job_id}: {result['message']}")
+            self.logger.info("Job %s: %s", job_id, result['message'])
+
+
+# Worker processes started by this process, by PID. Liveness checks on these
+# use the Process handle (waitpid), which also reaps exited workers and
+# cannot be fooled by PID reuse; PIDs known only from the PID file fall back
+# to utils.is_process_running.
+_PROCESSES: Dict[int, multiprocessing.Process] = {}
+
+
+def _worker_alive(pid: int) -> bool:
+    """Check whether a worker process is still running"""
+    from .utils import is_process_running
+    
+    process = _PROCESSES.get(pid)
+    if process is not None:
+        return process.is_alive()
+    return is_process_running(pid)
+
+
+def _stop_worker(pid: int, timeout: int) -> bool:
+    """Send SIGTERM to a worker, then SIGKILL it if it has not exited within `timeout` seconds"""
+    from .utils import terminate_process
+    
+    process = _PROCESSES.pop(pid, None)
+    if process is None:
+        return terminate_process(pid, timeout=timeout)
+    
+    # join() waits on the child directly instead of polling its PID
+    process.terminate()
+    process.join(timeout)
+    if process.is_alive():
+        process.kill()
+        process.join()
+    return True
 
 
 class WorkerManager:
@@ -159,7 +243,7 @@ class WorkerManager:
                 'message': 'Worker count must be at least 1'
             }
         
-        self.logger.info(f"Starting {count} worker(s)")
+        self.logger.info("Starting %d worker(s)", count)
         
         pids = []
         for i in range(count):
@@ -173,10 +257,13 @@ class WorkerManager:
             )
             process.start()
             
-            # Don't keep reference to process object to allow it to run independently
+            # Keep the handle for cheap, reuse-safe liveness checks; the PID
+            # file lets later CLI invocations find the worker too
+            _PROCESSES[process.pid] = process
+            self.processes.append(process)
             pids.append(process.pid)
             
-            self.logger.info(f"Started worker {worker_id} (PID: {process.pid})")
+            self.logger.info("Started worker %s (PID: %s)", worker_id, process.pid)
         
         # Save PIDs to file for later stop command
         save_worker_pids(pids)
@@ -200,7 +287,7 @@ class WorkerManager:
         Returns:
             Dictionary with success status and stopped worker count
         """
-        from .utils import load_worker_pids, is_process_running, terminate_process, clear_worker_pids
+        from .utils import load_worker_pids, clear_worker_pids
         
         pids = load_worker_pids()
         
@@ -211,19 +298,19 @@ class WorkerManager:
                 'stopped': 0
             }
         
-        self.logger.info(f"Stopping {len(pids)} worker(s)")
+        self.logger.info("Stopping %d worker(s)", len(pids))
         
         stopped = 0
         for pid in pids:
-            if is_process_running(pid):
-                self.logger.info(f"Stopping worker PID {pid}")
-                if terminate_process(pid, timeout=10):
+            if _worker_alive(pid):
+                self.logger.info("Stopping worker PID %s", pid)
+                if _stop_worker(pid, timeout=10):
                     stopped += 1
-                    self.logger.info(f"Worker PID {pid} stopped")
+                    self.logger.info("Worker PID %s stopped", pid)
                 else:
-                    self.logger.warning(f"Failed to stop worker PID {pid}")
+                    self.logger.warning("Failed to stop worker PID %s", pid)
             else:
-                self.logger.info(f"Worker PID {pid} not running")
+                self.logger.info("Worker PID %s not running", pid)
         
         # Clear PID file
         clear_worker_pids()
@@ -241,25 +328,22 @@ class WorkerManager:
         Returns:
             Dictionary with worker status information
         """
-        from .utils import load_worker_pids, is_process_running
+        from .utils import load_worker_pids
         
         pids = load_worker_pids()
-        storage = Storage(self.config.db_path)
+        # Storage shares the process-wide connection pool, so there is
+        # nothing to close here
+        workers_db = Storage(self.config.db_path).list_workers()
         
-        try:
-            workers_db = storage.list_workers()
-            
-            active_pids = [pid for pid in pids if is_process_running(pid)]
-            
-            return {
-                'registered_workers': len(workers_db),
-                'tracked_pids': len(pids),
-                'active_pids': len(active_pids),
-                'workers': workers_db,
-                'pids': active_pids
-            }
-        finally:
-            storage.close()
+        active_pids = [pid for pid in pids if _worker_alive(pid)]
+        
+        return {
+            'registered_workers': len(workers_db),
+            'tracked_pids': len(pids),
+            'active_pids': len(active_pids),
+            'workers': workers_db,
+            'pids': active_pids
+        }
 
 
 def worker_main():
@@ -14,6 +14,10 @@ setup(
         "click>=8.1.0",
         "tabulate>=0.9.0",
     ],
+    extras_require={
+        # Faster JSON encoding/decoding; the stdlib json module is used otherwise
+        "fast": ["orjson>=3.0"],
+    },
     entry_points={
         "console_scripts": [
             "queuectl=queuectl.cli:main",
@@ -5,127 +5,222 @@ Comprehensive tests validating all core functionality
 """
 
 import os
+import re
+import shlex
+import sqlite3
+import tempfile
 import time
 import threading
 import subprocess
 import sys
-from queuectl.storage import Storage
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import suppress
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, Callable, List, NamedTuple, Optional
+from queuectl.storage import Storage, JobState, doorbell_path, SCHEMA_VERSION, now_us, _SQL_SELECT_NEXT_PENDING, _SQL_LIST_JOBS_BY_STATE, _SQL_RELEASE_WORKER_JOBS
 from queuectl.queue import Queue
 from queuectl.worker import Worker
-from queuectl.config import Config
+from queuectl.config import Config, calculate_backoff_delay
+from queuectl.utils import execute_command, OUTPUT_TAIL_BYTES, _simple_argv
 
-def cleanup_test_files():
+def test_file(name):
+    """Per-process name for a test file, so tests can run in parallel"""
+    base, ext = os.path.splitext(name)
+    return f"{base}-{os.getpid()}{ext}"
+
+def cleanup_test_files(db_path=None):
     """Remove test database files"""
-    for f in ["test.db", "test_config.json"]:
-        if os.path.exists(f):
-            os.remove(f)
+    files = [test_file("test_config.json")]
+    if db_path:
+        files += [db_path + suffix for suffix in ("", "-wal", "-shm", "-journal")]
+        files.append(doorbell_path(db_path))
+    for f in files:
+        with suppress(FileNotFoundError):
+            os.unlink(f)
+
+def fake_executor(exit_code=0, delay=0):
+    """Stand-in for execute_command that runs no subprocess"""
+    def execute(command, timeout=None):
+        if delay:
+            time.sleep(delay)
+        return exit_code, "", ""
+    return execute
+
+def run_workers_until(workers, predicate, timeout):
+    """
+    Run workers until predicate() holds or timeout seconds pass
+    
+    The predicate is checked each time a worker polls for a job, through the
+    storage's on_fetch hook, and stop_after bounds the run, so no watchdog
+    thread is needed. The first worker runs in the calling thread.
+    """
+    storage = workers[0].storage
+    on_fetch = storage.on_fetch
+    def check(job):
+        if on_fetch is not None:
+            on_fetch(job)
+        if predicate():
+            for worker in workers:
+                worker.stop()
+    
+    storage.on_fetch = check
+    try:
+        for worker in workers:
+            worker.stop_after(timeout)
+        threads = [threading.Thread(target=worker.start, daemon=True) for worker in workers[1:]]
+        for thread in threads:
+            thread.start()
+        workers[0].start()
+        for thread in threads:
+            thread.join()
+    finally:
+        storage.on_fetch = on_fetch
+
+# In-memory storage shared by the tests run in this process; see shared_storage()
+_STORAGE = None
+
+def shared_storage():
+    """Storage reused across tests, so each test doesn't pay for connect + schema setup"""
+    global _STORAGE
+    if _STORAGE is None:
+        _STORAGE = Storage(":memory:", fast=True)
+    return _STORAGE
+
+def _reset(storage):
+    """Empty a shared storage in one transaction so the next test starts clean"""
+    with storage._get_cursor(immediate=True) as cursor:
+        cursor.execute("DELETE FROM jobs")
+        cursor.execute("DELETE FROM workers")
+    return storage
 
 def print_test_header(test_name):
     print(f"\n{'=' * 70}")
     print(f"  {test_name}")
     print(f"{'=' * 70}\n")
 
-def test_1_basic_completion():
-    """Test 1: Basic job completes successfully"""
-    print_test_header("Test 1: Basic Job Completion")
-    
-    cleanup_test_files()
-    storage = Storage("test.db")
-    queue = Queue(storage=storage)
-    
-    # Enqueue simple job
-    result = queue.enqueue({"id": "test-basic", "command": "python -c \"print('Hello')\""})
-    print(f"✓ Enqueued: {result['message']}")
-    
-    # Run worker
-    worker = Worker("test-worker-1", queue=queue)
-    threading.Thread(target=lambda: (time.sleep(2), setattr(worker, 'running', False)), daemon=True).start()
-    worker.start()
-    
-    # Verify
+class Case(NamedTuple):
+    """
+    A table-driven test case; see run_case
+    
+    `name` is the summary name, `title` the header printed when it runs.
+    """
+    name: str
+    title: str
+    jobs: List[dict]
+    done: Any
+    check: Callable
+    timeout: float
+    options: Optional[dict] = None
+
+def run_case(case):
+    """
+    Run one table-driven test case end to end
+    
+    Enqueues case.jobs, runs workers until case.done(storage) holds (or
+    case.timeout seconds pass), then calls case.check(storage, run), which
+    asserts and returns the pass message. `done` may be a tuple of
+    predicates: each one is a phase, and the database is reopened between
+    phases, as after a restart.
+    
+    Options:
+        executor: Worker executor (default: fake_executor())
+        workers: Number of workers run in parallel (default 1)
+        config: Config values for the case, written to a per-process file
+        persistent: Use a file-backed database instead of the shared
+            in-memory one (which has a single connection)
+    """
+    options = case.options or {}
+    print_test_header(case.title)
+    
+    phases = case.done if isinstance(case.done, tuple) else (case.done,)
+    db_path = test_file("test.db") if options.get("persistent") else None
+    cleanup_test_files(db_path)
+    
+    config = None
+    if options.get("config"):
+        config = Config(test_file("test_config.json"))
+        config.update(options["config"])
+    
+    # What the workers did: commands run, claim times (monotonic ns) by job
+    # ID, and the jobs seen on each side of a restart
+    run = {"executed": [], "claims": {}, "restarts": []}
+    execute = options.get("executor") or fake_executor()
+    def recording_executor(command, timeout=None):
+        run["executed"].append(command)
+        return execute(command, timeout=timeout)
+    def record_claim(job):
+        if job:
+            run["claims"].setdefault(job['id'], []).append(time.monotonic_ns())
+    
+    storage = Storage(db_path, fast=True) if db_path else _reset(shared_storage())
+    try:
+        for phase, phase_done in enumerate(phases):
+            if phase:
+                # Simulate a restart
+                jobs_before = storage.list_jobs()
+                storage.close()
+                storage = Storage(db_path, fast=True)
+                run["restarts"].append((jobs_before, storage.list_jobs()))
+                print(f"✓ Restarted with {len(jobs_before)} job(s) before, "
+                      f"{len(run['restarts'][-1][1])} after")
+            
+            queue = Queue(storage=storage, config=config)
+            if not phase:
+                result = queue.enqueue_many(case.jobs)
+                print(f"✓ Enqueued: {result['message']}")
+            
+            storage.on_fetch = record_claim
+            workers = [Worker(f"test-worker-{phase + 1}-{i + 1}", queue=queue,
+                              executor=recording_executor)
+                       for i in range(options.get("workers", 1))]
+            run_workers_until(workers, lambda: phase_done(storage), case.timeout)
+        
+        message = case.check(storage, run)
+    finally:
+        # The shared storage is reused by later cases
+        storage.on_fetch = None
+        if db_path:
+            storage.close()
+        cleanup_test_files(db_path)
+    
+    print(f"✅ PASSED: {message}\n")
+    return True
+
+def _check_basic(storage, run):
     job = storage.get_job("test-basic")
-    storage.close()
-    
     assert job['state'] == 'completed' and job['attempts'] == 1, f"Expected completed/1, got {job['state']}/{job['attempts']}"
-    print("✅ PASSED: Job completed successfully\n")
-    return True
+    return "Job completed successfully"
+
+# Fractional backoff keeps the retry wait short: 0.05 * 1.3 ** 1 = 0.065s
+_RETRY_CONFIG = {
+    "max_retries": 2,
+    "backoff_base": 1.3,
+    "backoff_initial": 0.05,
+    "backoff_jitter": "none",
+    "worker_poll_interval": 0.01,
+}
 
-def test_2_retry_and_dlq():
-    """Test 2: Failed job retries with backoff and moves to DLQ"""
-    print_test_header("Test 2: Retry with Exponential Backoff and DLQ")
-    
-    cleanup_test_files()
-    config = Config("test_config.json")
-    config.set("max_retries", 2)
-    config.set("backoff_base", 2)
-    
-    storage = Storage("test.db")
-    queue = Queue(storage=storage)
-    
-    # Enqueue failing job
-    result = queue.enqueue({
-        "id": "test-fail",
-        "command": "python -c \"import sys; sys.exit(1)\"",
-        "max_retries": 2
-    })
-    print(f"✓ Enqueued failing job: {result['message']}")
-    
-    # Track retry timing
-    retry_times = []
-    original_get = storage.get_next_pending_job
-    def track_timing(worker_id):
-        job = original_get(worker_id)
-        if job and job['id'] == 'test-fail':
-            retry_times.append(time.time())
-        return job
-    storage.get_next_pending_job = track_timing
-    
-    # Run worker
-    worker = Worker("test-worker-2", queue=queue)
-    threading.Thread(target=lambda: (time.sleep(8), setattr(worker, 'running', False)), daemon=True).start()
-    worker.start()
-    
-    # Verify DLQ
+def _retries_exhausted(storage):
+    job = storage.get_job("test-fail")
+    return job['state'] in ('dlq', 'failed') and job['attempts'] == 2
+
+def _check_retry(storage, run):
     job = storage.get_job("test-fail")
-    storage.close()
-    os.remove("test_config.json")
     
-    # Check backoff timing
-    if len(retry_times) >= 2:
-        delay = retry_times[1] - retry_times[0]
-        print(f"✓ Backoff delay: {delay:.1f}s (expected ~2s)")
+    # Check backoff timing: the retry must not be claimed before its backoff ran out
+    retry_times = run["claims"].get("test-fail", [])
+    expected_delay = _RETRY_CONFIG["backoff_initial"] * _RETRY_CONFIG["backoff_base"]
+    assert len(retry_times) == 2, f"Expected 2 attempts, saw {len(retry_times)}"
+    delay = (retry_times[1] - retry_times[0]) / 1e9
+    print(f"✓ Backoff delay: {delay:.3f}s (expected ~{expected_delay:.3f}s)")
+    assert delay >= expected_delay, f"Retried after {delay:.3f}s, before the {expected_delay:.3f}s backoff"
     
     assert job['state'] == 'dlq' and job['attempts'] == 2, f"Expected dlq/2, got {job['state']}/{job['attempts']}"
-    print("✅ PASSED: Job moved to DLQ after retries with exponential backoff\n")
-    return True
+    return "Job moved to DLQ after retries with exponential backoff"
 
-def test_3_concurrent_workers():
-    """Test 3: Multiple workers without overlap"""
-    print_test_header("Test 3: Multiple Workers - No Duplicate Processing")
-    
-    cleanup_test_files()
-    storage = Storage("test.db")
-    queue = Queue(storage=storage)
-    
-    # Enqueue multiple jobs
-    print("✓ Enqueueing 5 jobs...")
-    for i in range(1, 6):
-        queue.enqueue({
-            "id": f"job-{i}",
-            "command": f"python -c \"import time; time.sleep(0.3); print('Job {i}')\""
-        })
-    
-    # Run multiple workers in sequence (simpler than multiprocessing for test)
-    print("✓ Running 2 worker iterations...")
-    for iteration in [1, 2]:
-        worker = Worker(f"worker-{iteration}", queue=queue)
-        threading.Thread(target=lambda: (time.sleep(3), setattr(worker, 'running', False)), daemon=True).start()
-        worker.start()
-    
-    # Verify no duplicates
+def _check_no_duplicates(storage, run):
     jobs = storage.list_jobs()
-    storage.close()
-    
     completed = [j for j in jobs if j['state'] == 'completed']
     duplicates = [j for j in jobs if j['attempts'] > 1]
     
@@ -133,36 +228,19 @@ def test_3_concurrent_workers():
     print(f"✓ Duplicate attempts: {len(duplicates)}")
     
     assert len(duplicates) == 0, f"Found {len(duplicates)} jobs with duplicate attempts"
-    assert len(completed) >= 4, f"Expected at least 4 completed, got {len(completed)}"
-    print("✅ PASSED: No duplicate job processing detected\n")
-    return True
+    assert len(run["executed"]) == len(set(run["executed"])), f"A job ran more than once: {sorted(run['executed'])}"
+    assert len(completed) == 5, f"Expected 5 completed, got {len(completed)}"
+    return "No duplicate job processing detected"
 
-def test_4_invalid_commands():
-    """Test 4: Invalid commands fail gracefully"""
-    print_test_header("Test 4: Graceful Failure on Invalid Commands")
-    
-    cleanup_test_files()
-    storage = Storage("test.db")
-    queue = Queue(storage=storage)
-    
-    # Enqueue invalid commands
-    test_cases = [
-        {"id": "invalid-cmd", "command": "nonexistent_command_xyz", "max_retries": 1},
-        {"id": "file-not-found", "command": "python missing.py", "max_retries": 1},
-    ]
-    
-    print("✓ Enqueueing invalid commands...")
-    for job in test_cases:
-        queue.enqueue(job)
-    
-    # Process
-    worker = Worker("test-worker-4", queue=queue)
-    threading.Thread(target=lambda: (time.sleep(4), setattr(worker, 'running', False)), daemon=True).start()
-    worker.start()
-    
-    # Verify graceful failures
+_INVALID_JOBS = [
+    {"id": "invalid-cmd", "command": "nonexistent_command_xyz", "max_retries": 1},
+    # Isolated mode without site skips interpreter startup work the test doesn't need
+    {"id": "file-not-found", "command": f"{shlex.quote(sys.executable)} -S -I missing.py", "max_retries": 1},
+]
+
+def _check_invalid(storage, run):
     all_passed = True
-    for test_case in test_cases:
+    for test_case in _INVALID_JOBS:
         job = storage.get_job(test_case['id'])
         if job['state'] not in ['failed', 'dlq']:
             all_passed = False
@@ -170,86 +248,426 @@ def test_4_invalid_commands():
         else:
             print(f"✓ {test_case['id']}: Failed gracefully ({job['state']})")
     
-    storage.close()
-    
     assert all_passed, "Some invalid commands did not fail as expected"
-    print("✅ PASSED: All invalid commands handled gracefully\n")
+    return "All invalid commands handled gracefully"
+
+def _check_persistence(storage, run):
+    jobs_before, jobs_after = run["restarts"][0]
+    assert len(jobs_before) == len(jobs_after), "Job count changed after restart"
+    return "All job data persisted across restart"
+
+def _count_completed(storage):
+    return sum(j['state'] == 'completed' for j in storage.list_jobs())
+
+CASES = [
+    Case("Basic Job Completion", "Test 1: Basic Job Completion",
+     [{"id": "test-basic", "command": "echo Hello"}],
+     lambda s: s.get_job("test-basic")['state'] == 'completed',
+     _check_basic, 2),
+    Case("Retry & DLQ with Backoff", "Test 2: Retry with Exponential Backoff and DLQ",
+     [{"id": "test-fail", "command": "false", "max_retries": 2}],
+     _retries_exhausted, _check_retry, 1.0,
+     {"executor": fake_executor(exit_code=1), "config": _RETRY_CONFIG}),
+    Case("Concurrent Workers", "Test 3: Multiple Workers - No Duplicate Processing",
+     [{"id": f"job-{i}", "command": f"echo 'Job {i}'"} for i in range(1, 6)],
+     lambda s: _count_completed(s) >= 5, _check_no_duplicates, 3,
+     # File-backed, so each worker claims through its own connection and the
+     # claims race in SQLite rather than queueing for one shared connection
+     {"executor": fake_executor(delay=0.01), "workers": 2, "persistent": True}),
+    Case("Invalid Command Handling", "Test 4: Graceful Failure on Invalid Commands",
+     _INVALID_JOBS,
+     lambda s: all(s.get_job(job['id'])['state'] in ('failed', 'dlq') for job in _INVALID_JOBS),
+     _check_invalid, 4, {"executor": execute_command}),
+    Case("Data Persistence", "Test 5: Data Persistence Across Restarts",
+     [{"id": "persist-1", "command": "echo 'Test 1'"},
+      {"id": "persist-2", "command": "echo 'Test 2'"}],
+     (lambda s: _count_completed(s) >= 1, lambda s: _count_completed(s) == 2),
+     _check_persistence, 2, {"executor": execute_command, "persistent": True}),
+]
+
+def test_6_polling_query_plan(storage=None):
+    """Test 6: Worker polling query is served by an index"""
+    print_test_header("Test 6: Polling Query Uses Index")
+    
+    storage = _reset(storage or shared_storage())
+    
+    with storage._connection() as conn:
+        cursor = conn.execute(
+            "EXPLAIN QUERY PLAN " + _SQL_SELECT_NEXT_PENDING,
+            ("pending", "failed", now_us())
+        )
+        plan = [row[3] for row in cursor.fetchall()]
+        
+        cursor = conn.execute(
+            "EXPLAIN QUERY PLAN " + _SQL_LIST_JOBS_BY_STATE, ("pending", 10)
+        )
+        list_plan = [row[3] for row in cursor.fetchall()]
+        
+        cursor = conn.execute(
+            "EXPLAIN QUERY PLAN " + _SQL_RELEASE_WORKER_JOBS, ("pending", "worker-1")
+        )
+        release_plan = [row[3] for row in cursor.fetchall()]
+    
+    for step in plan:
+        print(f"✓ {step}")
+    
+    # SQLite before 3.36 writes "SCAN TABLE jobs" / "SEARCH TABLE jobs"
+    def scans_jobs(steps):
+        return any(re.match(r"SCAN( TABLE)? jobs\b", step) for step in steps)
+    
+    assert not scans_jobs(plan), f"Polling query scans the jobs table: {plan}"
+    assert any("idx_jobs_state_retry" in step for step in plan), f"Composite index not used: {plan}"
+    assert not scans_jobs(list_plan), f"State listing scans the jobs table: {list_plan}"
+    assert any("idx_jobs_state_created" in step for step in list_plan), f"State listing index not used: {list_plan}"
+    assert not any("TEMP B-TREE" in step for step in list_plan), f"State listing needs a sort: {list_plan}"
+    assert not scans_jobs(release_plan), f"Worker release scans the jobs table: {release_plan}"
+    assert any("idx_jobs_worker_processing" in step for step in release_plan), f"Worker release index not used: {release_plan}"
+    print("✅ PASSED: Polling query avoids a full table scan\n")
     return True
 
-def test_5_persistence():
-    """Test 5: Job data survives restart"""
-    print_test_header("Test 5: Data Persistence Across Restarts")
-    
-    cleanup_test_files()
-    
-    # Phase 1: Create jobs
-    print("Phase 1: Initial setup")
-    storage1 = Storage("test.db")
-    queue1 = Queue(storage=storage1)
-    
-    jobs = [
-        {"id": "persist-1", "command": "echo 'Test 1'"},
-        {"id": "persist-2", "command": "echo 'Test 2'"},
-    ]
-    
-    for job in jobs:
-        queue1.enqueue(job)
-    print(f"✓ Enqueued {len(jobs)} jobs")
-    
-    # Process one
-    worker1 = Worker("worker-phase1", queue=queue1)
-    threading.Thread(target=lambda: (time.sleep(1), setattr(worker1, 'running', False)), daemon=True).start()
-    worker1.start()
-    
-    jobs_before = storage1.list_jobs()
-    print(f"✓ Jobs before restart: {len(jobs_before)}")
-    storage1.close()
-    
-    # Phase 2: Simulate restart
-    print("\nPhase 2: After restart")
-    storage2 = Storage("test.db")
-    queue2 = Queue(storage=storage2)
+def test_7_enqueue_stdin_cli():
+    """Test 7: `queuectl enqueue --stdin` skips existing and repeated IDs"""
+    print_test_header("Test 7: CLI Bulk Enqueue Skips Existing and Repeated IDs")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Run the CLI in its own directory so it uses a fresh default database
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        def queuectl(*args, stdin=None):
+            return subprocess.run([sys.executable, "-m", "queuectl", *args], cwd=tmp, env=env,
+                                  input=stdin, capture_output=True, text=True, timeout=30)
+        
+        first = queuectl("enqueue", '{"id": "existing", "command": "echo 1"}')
+        assert first.returncode == 0, first.stdout + first.stderr
+        
+        lines = [
+            '{"id": "a", "command": "echo a"}',
+            '{"id": "existing", "command": "echo again"}',
+            '{"id": "b", "command": "echo b"}',
+            '{"id": "a", "command": "echo a again"}',
+        ]
+        bulk = queuectl("enqueue", "--stdin", stdin="\n".join(lines) + "\n")
+        print(bulk.stdout)
+        
+        storage = Storage(os.path.join(tmp, "queuectl.db"))
+        jobs = {job['id']: job['command'] for job in storage.list_jobs()}
+        storage.close()
+    
+    assert bulk.returncode == 1, f"Skipped jobs should be reported as failures: {bulk.returncode}"
+    assert "Enqueued 2 job(s), 2 failed" in bulk.stdout, bulk.stdout + bulk.stderr
+    assert jobs == {"existing": "echo 1", "a": "echo a", "b": "echo b"}, f"Unexpected jobs: {jobs}"
+    print("✅ PASSED: Existing and repeated IDs skipped; the rest of the batch was enqueued\n")
+    return True
+
+def test_8_read_only_open():
+    """Test 8: A current-version database opens read-only"""
+    print_test_header("Test 8: Read-Only Open of a Current Database")
+    
+    db_path = test_file("test.db")
+    cleanup_test_files(db_path)
+    try:
+        storage = Storage(db_path)
+        storage.enqueue_job("ro-1", "echo 1", 3, None)
+        storage.close()
+        
+        read_only = Storage(f"file:{db_path}?mode=ro")
+        jobs = read_only.list_jobs()
+        stats = read_only.get_job_stats()
+        read_only.close()
+    finally:
+        cleanup_test_files(db_path)
+    
+    print(f"✓ Listed {len(jobs)} job(s) read-only")
+    assert [job['id'] for job in jobs] == ["ro-1"], f"Unexpected jobs: {jobs}"
+    assert stats['pending'] == 1, f"Unexpected stats: {stats}"
+    print("✅ PASSED: Opening a current database writes nothing\n")
+    return True
+
+# Schema and rows as written by the first release (user_version 0), which
+# stored every timestamp as an ISO-8601 string
+_V0_SCHEMA = """
+    CREATE TABLE jobs (
+        id TEXT PRIMARY KEY,
+        command TEXT NOT NULL,
+        state TEXT NOT NULL,
+        attempts INTEGER DEFAULT 0,
+        max_retries INTEGER DEFAULT 3,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        started_at TEXT,
+        completed_at TEXT,
+        next_retry_at TEXT,
+        error_message TEXT,
+        worker_id TEXT,
+        metadata TEXT
+    );
+    CREATE INDEX idx_jobs_state ON jobs(state);
+    CREATE INDEX idx_jobs_next_retry ON jobs(next_retry_at);
+    CREATE TABLE workers (
+        worker_id TEXT PRIMARY KEY,
+        pid INTEGER NOT NULL,
+        started_at TEXT NOT NULL,
+        last_heartbeat TEXT NOT NULL,
+        status TEXT NOT NULL
+    );
+"""
+_V0_JOBS = [
+    ("m-pending", "echo 1", "pending", 0, 3, "2024-01-02T03:04:05.123456",
+     "2024-01-02T03:04:05.123456", None, None, None, None, None, '{"owner": "a"}'),
+    ("m-failed", "false", "failed", 1, 3, "2024-01-02T03:04:05",
+     "2024-01-02T03:04:06", "2024-01-02T03:04:05.500000", None,
+     "2024-01-02T03:04:10", "Exit code 1", None, None),
+    ("m-done", "echo 3", "completed", 1, 3, "2024-01-02T03:04:05",
+     "2024-01-02T03:04:07", "2024-01-02T03:04:06", "2024-01-02T03:04:07.250000",
+     None, None, "w-1", None),
+]
+
+def _iso_us(value):
+    """Epoch microseconds of a naive UTC ISO-8601 string"""
+    dt = datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+    return int(dt.timestamp()) * 1_000_000 + dt.microsecond
+
+def test_9_schema_migration():
+    """Test 9: A first-release database is migrated to the current schema"""
+    print_test_header("Test 9: Schema Migration From Version 0")
+    
+    db_path = test_file("test.db")
+    cleanup_test_files(db_path)
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.executescript(_V0_SCHEMA)
+        conn.executemany("INSERT INTO jobs VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", _V0_JOBS)
+        conn.execute("INSERT INTO workers VALUES ('w-1', 123, '2024-01-02T03:04:00', "
+                     "'2024-01-02T03:04:07', 'active')")
+        conn.commit()
+        conn.close()
+        
+        storage = Storage(db_path)
+        with storage._connection() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+        jobs = {job['id']: job for job in storage.list_jobs()}
+        workers = storage.list_workers()
+        stats = storage.get_job_stats()
+        storage.close()
+    finally:
+        cleanup_test_files(db_path)
+    
+    print(f"✓ user_version: {version}")
+    print(f"✓ Stats: {stats}")
+    assert version == SCHEMA_VERSION, f"Expected version {SCHEMA_VERSION}, got {version}"
+    
+    pending, failed, done = jobs["m-pending"], jobs["m-failed"], jobs["m-done"]
+    assert pending['created_at'] == _iso_us("2024-01-02T03:04:05.123456"), pending
+    assert pending['metadata'] == {"owner": "a"}, pending
+    assert failed['created_at'] == _iso_us("2024-01-02T03:04:05"), failed
+    assert failed['started_at'] == _iso_us("2024-01-02T03:04:05.5"), failed
+    assert failed['next_retry_at'] == _iso_us("2024-01-02T03:04:10"), failed
+    assert done['completed_at'] == _iso_us("2024-01-02T03:04:07.25"), done
+    assert done['started_at'] == _iso_us("2024-01-02T03:04:06"), done
+    assert [w['last_heartbeat'] for w in workers] == [_iso_us("2024-01-02T03:04:07")], workers
+    
+    expected = dict.fromkeys(JobState.ALL, 0)
+    expected.update(pending=1, failed=1, completed=1)
+    assert stats == expected, f"Expected {expected}, got {stats}"
+    print("✅ PASSED: Version 0 database migrated with timestamps and counts intact\n")
+    return True
+
+def test_10_state_counts(storage=None):
+    """Test 10: Trigger-maintained state counts match the jobs table"""
+    print_test_header("Test 10: State Counts Stay in Step With Jobs")
+    
+    storage = _reset(storage or shared_storage())
+    
+    def assert_counts_match(step):
+        with storage._connection() as conn:
+            actual = dict.fromkeys(JobState.ALL, 0)
+            actual.update(conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        stats = storage.get_job_stats()
+        assert stats == actual, f"After {step}: counters {stats}, table {actual}"
+        print(f"✓ {step}: {stats}")
+    
+    storage.enqueue_jobs_bulk([(f"c-{i}", "true", 2 if i < 4 else 1, None) for i in range(6)])
+    storage.enqueue_job("c-6", "true", 3, None)
+    storage.enqueue_jobs([("c-6", "true", 3, None), ("c-7", "true", 3, None)])
+    assert_counts_match("enqueue")
+    
+    claimed = [storage.claim_next("w-1")['id'] for _ in range(6)]
+    assert_counts_match("claim")
+    
+    later = now_us() + 60_000_000
+    storage.update_job_state(claimed[0], JobState.COMPLETED)
+    storage.atomic_fail_or_dlq(claimed[1], "boom", later)   # retry
+    storage.atomic_fail_or_dlq(claimed[4], "boom", later)   # max_retries 1: DLQ
+    storage.schedule_retry(claimed[2], later, "boom")
+    storage.move_to_dlq(claimed[3], "boom")
+    assert_counts_match("complete, fail and DLQ")
+    
+    storage.requeue_job(claimed[4], [JobState.FAILED, JobState.DLQ])
+    storage.requeue_job(claimed[1], [JobState.FAILED, JobState.DLQ])
+    storage.requeue_job(claimed[0], [JobState.FAILED, JobState.DLQ])  # completed: no-op
+    assert_counts_match("retry")
+    
+    storage.register_worker("w-1", os.getpid())
+    storage.deregister_worker("w-1")  # releases claimed[5]
+    assert_counts_match("worker release")
+    
+    with storage._get_cursor() as cursor:
+        cursor.execute("DELETE FROM jobs WHERE id IN (?, ?)", (claimed[0], claimed[3]))
+    assert_counts_match("delete")
+    
+    print("✅ PASSED: State counters match GROUP BY after every kind of transition\n")
+    return True
+
+def test_11_command_dispatch():
+    """Test 11: Simple commands skip the shell; shell syntax still gets one"""
+    print_test_header("Test 11: Shell-less Execution of Simple Commands")
+    
+    executable, argv = _simple_argv("echo hello world")
+    assert os.path.basename(executable) == "echo" and argv == ["echo", "hello", "world"], (executable, argv)
+    for command in ("echo hi > out.txt", "echo $HOME", "echo 'quoted'", "a && b",
+                    "nonexistent_command_xyz --flag"):
+        assert _simple_argv(command) is None, f"{command!r} should go through the shell"
+    print("✓ Shell syntax and unknown programs fall back to /bin/sh")
+    
+    assert execute_command("echo hello") == (0, "hello\n", ""), execute_command("echo hello")
+    assert execute_command("echo a | tr a b") == (0, "b\n", ""), "Pipeline did not run in a shell"
+    exit_code, _, stderr = execute_command("nonexistent_command_xyz")
+    assert exit_code == 127, f"Missing program should exit 127, got {exit_code}: {stderr}"
+    print(f"✓ Missing program: exit {exit_code}")
+    
+    # A script without a #! line can't be exec'd; /bin/sh runs it instead.
+    # Once it's removed, its memoized path is stale and the shell reports 127.
+    path = os.environ.get("PATH", "")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        script = os.path.join(tmpdir, "queuectl_no_shebang")
+        with open(script, "w") as f:
+            f.write("echo from-script\n")
+        os.chmod(script, 0o755)
+        os.environ["PATH"] = tmpdir + os.pathsep + path
+        try:
+            result = execute_command("queuectl_no_shebang")
+            assert result == (0, "from-script\n", ""), f"Script without #! failed: {result}"
+            os.remove(script)
+            exit_code, _, stderr = execute_command("queuectl_no_shebang")
+            assert exit_code == 127, f"Removed program should exit 127, got {exit_code}: {stderr}"
+        finally:
+            os.environ["PATH"] = path
+    print(f"✓ Script without #! ran via /bin/sh; removed program: exit {exit_code}")
+    
+    print("✅ PASSED: Commands dispatched with and without a shell as expected\n")
+    return True
+
+def test_12_output_tail_and_timeout():
+    """Test 12: Job output is cut to its tail, and timed-out jobs are killed"""
+    print_test_header("Test 12: Output Tail and Timeout Kill")
+    
+    python = f"{shlex.quote(sys.executable)} -S -I -c"
+    size = OUTPUT_TAIL_BYTES + 1000
+    exit_code, stdout, stderr = execute_command(
+        f"{python} \"import sys; sys.stdout.write('o' * {size} + 'END'); "
+        f"sys.stderr.write('e' * {size} + 'ERR')\""
+    )
+    assert exit_code == 0, stderr[-200:]
+    assert len(stdout) == OUTPUT_TAIL_BYTES and stdout.endswith("oEND"), f"stdout tail: {len(stdout)} chars"
+    assert len(stderr) == OUTPUT_TAIL_BYTES and stderr.endswith("eERR"), f"stderr tail: {len(stderr)} chars"
+    print(f"✓ Kept the last {OUTPUT_TAIL_BYTES} bytes of each stream")
+    
+    start = time.monotonic()
+    exit_code, stdout, stderr = execute_command("sleep 5", timeout=0.2)
+    elapsed = time.monotonic() - start
+    print(f"✓ Timed out after {elapsed:.2f}s: {stderr}")
+    assert exit_code == -1 and "timed out" in stderr, (exit_code, stderr)
+    assert elapsed < 2, f"Command was not killed at its timeout ({elapsed:.2f}s)"
+    
+    print("✅ PASSED: Output bounded and timed-out command killed\n")
+    return True
+
+
+def test_13_metadata_isolation(storage=None):
+    """Test 13: Jobs with the same metadata do not share nested objects"""
+    print_test_header("Test 13: Metadata Copies Are Independent")
     
-    jobs_after = storage2.list_jobs()
-    print(f"✓ Jobs after restart: {len(jobs_after)}")
+    storage = _reset(storage or shared_storage())
+    metadata = {"tags": ["a"], "env": {"LEVEL": "1"}}
+    storage.enqueue_job("m-1", "true", 3, metadata)
+    storage.enqueue_job("m-2", "true", 3, metadata)
     
-    # Process remaining
-    worker2 = Worker("worker-phase2", queue=queue2)
-    threading.Thread(target=lambda: (time.sleep(2), setattr(worker2, 'running', False)), daemon=True).start()
-    worker2.start()
+    first = storage.get_job("m-1")['metadata']
+    first["tags"].append("b")
+    first["env"]["LEVEL"] = "2"
     
-    jobs_final = storage2.list_jobs()
-    storage2.close()
+    for job_id in ("m-1", "m-2"):
+        fetched = storage.get_job(job_id)['metadata']
+        print(f"✓ {job_id}: {fetched}")
+        assert fetched == metadata, f"{job_id} sees another caller's edits: {fetched}"
     
-    assert len(jobs_before) == len(jobs_after), "Job count changed after restart"
-    print("✅ PASSED: All job data persisted across restart\n")
+    print("✅ PASSED: Metadata is copied for every caller\n")
+    return True
+
+def test_14_backoff_cap(storage=None):
+    """Test 14: Backoff for a high attempt count is capped, not overflowed"""
+    print_test_header("Test 14: Backoff Capped at High Attempt Counts")
+    
+    for attempts, base, initial in ((2000, 1.5, 1), (1100, 2, 0.5), (10**9, 2, 1)):
+        delay = calculate_backoff_delay(attempts, base=base, max_delay=3600,
+                                        jitter="none", initial=initial)
+        assert delay == 3600, f"{initial} * {base} ** {attempts}: expected 3600, got {delay}"
+    print("✓ Fractional and integer settings cap at backoff_max_delay")
+    
+    storage = _reset(storage or shared_storage())
+    config = Config(test_file("test_config.json"))
+    try:
+        config.update({"backoff_base": 1.5, "backoff_jitter": "none"})
+        storage.enqueue_job("b-1", "false", 5000, None)
+        storage.claim_next("w-1")
+        result = Queue(storage=storage, config=config).handle_job_failure(
+            "b-1", "boom", "w-1", attempts=2000)
+        print(f"✓ {result['message']}")
+        assert result['action'] == 'retry', result
+    finally:
+        cleanup_test_files()
+    
+    print("✅ PASSED: High attempt counts wait backoff_max_delay\n")
     return True
 
+# Tests by summary name; pool workers look them up here, as the case
+# tables hold lambdas that cannot be pickled
+TESTS = {case.name: partial(run_case, case) for case in CASES}
+TESTS["Polling Query Plan"] = test_6_polling_query_plan
+TESTS["CLI Bulk Enqueue"] = test_7_enqueue_stdin_cli
+TESTS["Read-Only Open"] = test_8_read_only_open
+TESTS["Schema Migration"] = test_9_schema_migration
+TESTS["State Counts"] = test_10_state_counts
+TESTS["Command Dispatch"] = test_11_command_dispatch
+TESTS["Output Tail and Timeout"] = test_12_output_tail_and_timeout
+TESTS["Metadata Isolation"] = test_13_metadata_isolation
+TESTS["Backoff Cap"] = test_14_backoff_cap
+
+def _run_one(test_name):
+    """Run one test, reporting failures as False so they cross process boundaries"""
+    try:
+        return bool(TESTS[test_name]())
+    except AssertionError as e:
+        print(f"❌ FAILED: {e}\n")
+    except Exception as e:
+        print(f"❌ ERROR: {e}\n")
+    return False
+
 def main():
     """Run all tests"""
     print("\n" + "=" * 70)
     print(" " * 20 + "QUEUECTL TEST SUITE")
     print("=" * 70)
     
-    tests = [
-        ("Basic Job Completion", test_1_basic_completion),
-        ("Retry & DLQ with Backoff", test_2_retry_and_dlq),
-        ("Concurrent Workers", test_3_concurrent_workers),
-        ("Invalid Command Handling", test_4_invalid_commands),
-        ("Data Persistence", test_5_persistence),
-    ]
+    tests = list(TESTS)
     
-    results = []
-    for test_name, test_func in tests:
-        try:
-            passed = test_func()
-            results.append((test_name, True))
-        except AssertionError as e:
-            print(f"❌ FAILED: {e}\n")
-            results.append((test_name, False))
-        except Exception as e:
-            print(f"❌ ERROR: {e}\n")
-            results.append((test_name, False))
+    # Tests use separate databases, so they run in parallel processes
+    outcomes = {}
+    with ProcessPoolExecutor(max_workers=len(tests)) as executor:
+        futures = {executor.submit(_run_one, test_name): test_name
+                   for test_name in tests}
+        for future in as_completed(futures):
+            outcomes[futures[future]] = future.result()
+    results = [(test_name, outcomes[test_name]) for test_name in tests]
     
     # Summary
     print("\n" + "=" * 70)
@@ -264,8 +682,6 @@ def main():
     print("=" * 70)
     print(f"\nResults: {passed_count}/{len(tests)} tests passed")
     
-    cleanup_test_files()
-    
     if passed_count == len(tests):
         print("\n🎉 ALL TESTS PASSED!\n")
         return 0